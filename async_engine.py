@@ -0,0 +1,304 @@
+'''
+Runs many independent matches at once in a single engine process on top of asyncio.
+
+Reuses the round and match logic of engine.py (RoundState, Game.round_queries,
+Game.match_queries with its checkpoints, and the logging) and talks to the bot
+subprocesses through asyncio streams over the configured TRANSPORT, so a query waiting on
+one bot never blocks the others. Plays ASYNC_MATCHES matches of NUM_ROUNDS rounds each
+between PLAYER_1 and PLAYER_2, at most ASYNC_CONCURRENCY of them at a time.
+'''
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import tempfile
+import time
+
+from engine import (PVALUE, CheckAction, FoldAction, Game, Player, RoundState, deal_seed, load_checkpoint,
+                    print_banner)
+from config import (ASYNC_CONCURRENCY, ASYNC_MATCHES, CHECKPOINT_INTERVAL, CHECKPOINT_NAME, CONNECT_TIMEOUT,
+                    DUPLICATE_DEALS, ENFORCE_GAME_CLOCK, GAME_LOG_FILENAME, MATCH_SEED, NUM_ROUNDS, PLAYER_1_NAME,
+                    PLAYER_1_PATH, PLAYER_2_NAME, PLAYER_2_PATH, PLAYER_TIMEOUT)
+
+OUTPUT_CHUNK_SIZE = 65536  # bytes of bot output read at a time, whatever its line lengths
+
+
+class AsyncPlayer(Player):
+    '''
+    Handles asyncio subprocess and stream interactions with one player's pokerbot.
+    '''
+
+    def __init__(self, name, path, log_name=None):
+        super().__init__(name, path, log_name)
+        self.reader = None
+        self.writer = None
+        self.output_task = None
+
+    async def capture_output(self, out):
+        '''
+        Streams the bot's output into its capture, in chunks rather than lines so a long
+        line cannot overrun the stream's buffer limit.
+        '''
+        while True:
+            chunk = await out.read(OUTPUT_CHUNK_SIZE)
+            if not chunk:
+                break
+            self.output.put(chunk)
+
+    async def start(self, args, pass_fds=()):
+        '''
+        Launches the pokerbot subprocess with the given connection arguments.
+        '''
+        proc = await asyncio.create_subprocess_exec(*self.commands['run'], *args,
+                                                    stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.STDOUT,
+                                                    cwd=self.path, pass_fds=pass_fds)
+        self.bot_subprocess = proc
+        self.output_task = asyncio.ensure_future(self.capture_output(proc.stdout))
+
+    async def run(self):
+        '''
+        Runs the pokerbot and establishes the stream connection, over the transport
+        Player.run would use.
+        '''
+        if self.commands is None or len(self.commands['run']) == 0:
+            return
+        connected = asyncio.get_running_loop().create_future()
+
+        def on_connect(reader, writer):
+            if not connected.done():
+                connected.set_result((reader, writer))
+
+        transport = self.transport()
+        engine_socket = None
+        server_socket = None
+        server = None
+        socket_dir = None
+        try:
+            if transport == 'socketpair':
+                engine_socket, bot_socket = socket.socketpair()
+                with bot_socket:
+                    await self.start(['--fd', str(bot_socket.fileno())], pass_fds=(bot_socket.fileno(),))
+                self.reader, self.writer = await asyncio.open_connection(sock=engine_socket)
+                # the bot announces itself once it has loaded, like a connect on the other transports
+                ready = await asyncio.wait_for(self.reader.readline(), CONNECT_TIMEOUT)
+                if ready.strip() != b'K':
+                    self.writer.close()
+                    self.reader = self.writer = None
+                    print(self.name, 'failed to connect - check "run" in commands.json')
+                    return
+            else:
+                if transport == 'unix':
+                    socket_dir = tempfile.mkdtemp()
+                    address = os.path.join(socket_dir, 'bot.sock')
+                    server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    server_socket.bind(address)
+                    server_socket.listen()
+                    server = await asyncio.start_unix_server(on_connect, sock=server_socket)
+                    await self.start(['--unix', address])
+                else:
+                    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    server_socket.bind(('', 0))
+                    server_socket.listen()
+                    server = await asyncio.start_server(on_connect, sock=server_socket)
+                    await self.start([str(server_socket.getsockname()[1])])
+                self.reader, self.writer = await asyncio.wait_for(connected, CONNECT_TIMEOUT)
+            print(self.name, 'connected successfully')
+        except (TypeError, ValueError):
+            print(self.name, 'run command misformatted')
+        except asyncio.TimeoutError:
+            print('Timed out waiting for', self.name, 'to connect')
+        except OSError:
+            print(self.name, 'run failed - check "run" in commands.json')
+        finally:
+            if self.writer is None and engine_socket is not None:
+                engine_socket.close()
+            if server is not None:
+                server.close()
+            if server_socket is not None:
+                server_socket.close()
+            if socket_dir is not None:
+                shutil.rmtree(socket_dir, ignore_errors=True)
+
+    async def stop(self):
+        '''
+        Closes the stream connection and stops the pokerbot.
+        '''
+        if self.writer is not None:
+            try:
+                self.writer.write((' '.join(self.pending + ['Q']) + '\n').encode())
+                await asyncio.wait_for(self.writer.drain(), CONNECT_TIMEOUT)
+                self.writer.close()
+            except asyncio.TimeoutError:
+                print('Timed out waiting for', self.name, 'to disconnect')
+            except OSError:
+                print('Could not close stream connection with', self.name)
+        if self.bot_subprocess is not None:
+            try:
+                await asyncio.wait_for(self.bot_subprocess.wait(), CONNECT_TIMEOUT)
+            except asyncio.TimeoutError:
+                print('Timed out waiting for', self.name, 'to quit')
+                self.bot_subprocess.kill()
+                await self.bot_subprocess.wait()
+            await self.output_task
+        dropped = self.output.close()
+        if dropped > 0:
+            print(self.name, 'printed too much - dropped', dropped, 'bytes from', self.log_name + '.txt')
+
+    async def query(self, round_state, player_message, game_log):
+        '''
+        Requests one action from the pokerbot over its stream, as Player.query does.
+
+        The wait is bounded with asyncio.wait_for by CONNECT_TIMEOUT, or by the remaining
+        game clock when it is enforced; ./player_chatbot, played by a person, gets
+        PLAYER_TIMEOUT and is never charged.
+        '''
+        legal_actions = round_state.legal_actions() if isinstance(round_state, RoundState) else {CheckAction}
+        self.latency = 0.
+        self.compute_time = None
+        if self.writer is not None and self.game_clock > 0.:
+            clause = ''
+            try:
+                player_message[0] = 'T{:.3f}'.format(self.game_clock)
+                message = ' '.join(player_message[:1] + self.pending + player_message[1:]) + '\n'
+                del player_message[1:]  # do not send redundant action history
+                self.pending = []
+                chatbot = self.path == r"./player_chatbot"
+                if chatbot:
+                    timeout = PLAYER_TIMEOUT
+                else:
+                    timeout = min(CONNECT_TIMEOUT, self.game_clock) if ENFORCE_GAME_CLOCK else CONNECT_TIMEOUT
+                start_time = time.perf_counter()
+                self.writer.write(message.encode())
+                line = await asyncio.wait_for(self.reader.readline(), timeout)
+                end_time = time.perf_counter()
+                if not line:
+                    raise ConnectionResetError
+                clause = self.read_report(line.decode())
+                self.latency = end_time - start_time
+                if ENFORCE_GAME_CLOCK and not chatbot:
+                    self.game_clock -= end_time - start_time
+                if self.game_clock <= 0.:
+                    raise asyncio.TimeoutError
+                action = self.decode(clause, round_state, legal_actions, game_log)
+                if action is not None:
+                    return action
+            except asyncio.TimeoutError:
+                error_message = self.name + ' ran out of time'
+                game_log.append(error_message)
+                print(error_message)
+                self.game_clock = 0.
+            except OSError:
+                error_message = self.name + ' disconnected'
+                game_log.append(error_message)
+                print(error_message)
+                self.game_clock = 0.
+            except (IndexError, KeyError, ValueError):
+                game_log.append(self.name + ' response misformatted: ' + str(clause))
+        return CheckAction() if CheckAction in legal_actions else FoldAction()
+
+
+class AsyncGame(Game):
+    '''
+    Plays one match of an asyncio engine run.
+    '''
+
+    async def answer_queries(self, queries):
+        '''
+        Answers the queries of a round_queries or match_queries generator, awaiting each
+        AsyncPlayer.query, and returns the generator's result.
+        '''
+        action = None
+        while True:
+            try:
+                player, round_state, player_message = queries.send(action)
+            except StopIteration as stop:
+                return stop.value
+            action = await player.query(round_state, player_message, self.log)
+
+    async def run_round(self, players, seed=None, round_num=0):
+        '''
+        Runs one round of poker, awaiting each query.
+        '''
+        await self.answer_queries(self.round_queries(players, seed, round_num))
+
+    async def play(self, players, first_round, last_round):
+        '''
+        Plays rounds first_round to last_round inclusive and returns the reseated players.
+        '''
+        return await self.answer_queries(self.match_queries(players, first_round, last_round))
+
+    async def run(self, match):
+        '''
+        Runs one match with its own pair of already built pokerbots and returns the bankrolls.
+
+        Checkpoints the match to its own checkpoint file every CHECKPOINT_INTERVAL rounds; a
+        game constructed from a checkpoint continues after its round.
+        '''
+        players = [
+            AsyncPlayer(PLAYER_1_NAME, PLAYER_1_PATH, '{}.match{}'.format(PLAYER_1_NAME, match)),
+            AsyncPlayer(PLAYER_2_NAME, PLAYER_2_PATH, '{}.match{}'.format(PLAYER_2_NAME, match))
+        ]
+        for player in players:
+            player.load_commands()
+        first_round = 1
+        if self.checkpoint is not None:
+            players, first_round = self.resume(players)
+        await asyncio.gather(*[player.run() for player in players])
+        if self.checkpoint is None:
+            self.log.append('Deals seeded with {}{}'.format(self.seed, ', each played twice' if DUPLICATE_DEALS else ''))
+        if CHECKPOINT_INTERVAL > 0:
+            self.checkpoint_name = match_checkpoint_name(match)
+        try:
+            players = await self.play(players, first_round, NUM_ROUNDS)
+            self.log_summary(players, {player.name: player.bankroll for player in players})
+            await asyncio.gather(*[player.stop() for player in players])
+            if self.checkpoint_name is not None and os.path.exists(self.checkpoint_name):
+                os.remove(self.checkpoint_name)
+        finally:
+            self.log.close()
+            if self.history is not None:
+                self.history.close()
+        return {player.name: player.bankroll for player in players}
+
+
+def match_checkpoint_name(match):
+    '''
+    Returns the checkpoint file of one match, CHECKPOINT_NAME with the match number.
+    '''
+    root, extension = os.path.splitext(CHECKPOINT_NAME)
+    return '{}.match{}{}'.format(root, match, extension)
+
+
+async def run_matches(resume=False):
+    '''
+    Builds both pokerbots once, then plays ASYNC_MATCHES matches concurrently. With resume,
+    a match that left a checkpoint continues from it and the others are played again.
+    '''
+    print_banner()
+    for player in [Player(PLAYER_1_NAME, PLAYER_1_PATH), Player(PLAYER_2_NAME, PLAYER_2_PATH)]:
+        player.build()
+    slots = asyncio.Semaphore(ASYNC_CONCURRENCY)
+
+    async def run_match(match):
+        async with slots:
+            log_name = '{}.match{}'.format(GAME_LOG_FILENAME, match)
+            checkpoint = None
+            if resume and os.path.exists(match_checkpoint_name(match)):
+                checkpoint = load_checkpoint(match_checkpoint_name(match))
+            if checkpoint is not None:
+                return await AsyncGame(checkpoint['seed'], log_name, checkpoint=checkpoint).run(match)
+            seed = None if MATCH_SEED is None else deal_seed(MATCH_SEED, 'match{}'.format(match))
+            return await AsyncGame(seed, log_name).run(match)
+
+    results = await asyncio.gather(*[run_match(match) for match in range(ASYNC_MATCHES)])
+    for match, bankrolls in enumerate(results):
+        print('Match {}{}'.format(match, ''.join([PVALUE(name, bankroll) for name, bankroll in bankrolls.items()])))
+    print('Total' + ''.join([PVALUE(name, sum(bankrolls[name] for bankrolls in results)) for name in results[0]]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python async_engine.py')
+    parser.add_argument('--resume', action='store_true', help='Continue interrupted matches from their last checkpoints')
+    asyncio.run(run_matches(parser.parse_args().resume))
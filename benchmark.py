@@ -0,0 +1,448 @@
+'''
+Throughput benchmarks for the engine and the bundled bots.
+
+    python benchmark.py run [-o benchmark.json] [--quick] [NAME ...]
+    python benchmark.py compare BASELINE [CURRENT] [--tolerance 0.1]
+
+run times every benchmark (or the named ones) with fixed seeds and writes the results as
+JSON: one entry per benchmark with its value, unit and whether higher or lower is better.
+compare reads two such files and flags every benchmark that got worse by more than the
+tolerance, exiting with status 1 if any did. Save a run as the baseline before a change
+and compare a run after it against that baseline.
+
+Benchmarks that need an uninstalled package (torch for the python_skeleton brain) are
+recorded as skipped.
+'''
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+import engine
+import equity
+
+SEED = 2026
+BENCHMARKS = {}
+
+
+def benchmark(name, unit, better='higher'):
+    '''
+    Registers a benchmark function returning its value in the given unit.
+    '''
+    def register(function):
+        BENCHMARKS[name] = (function, unit, better)
+        return function
+    return register
+
+
+def rate(run, min_time):
+    '''
+    Calls run() until min_time has passed and returns operations per second, best of three.
+
+    run() performs a batch of operations and returns how many.
+    '''
+    best = 0.
+    for _ in range(3):
+        operations = 0
+        start_time = time.perf_counter()
+        elapsed = 0.
+        while elapsed < min_time:
+            operations += run()
+            elapsed = time.perf_counter() - start_time
+        best = max(best, operations / elapsed)
+    return best
+
+
+def load_module(name, path):
+    '''
+    Imports a bot module by file path under a name of its own.
+    '''
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def scripted_rounds(num_rounds):
+    '''
+    Plays rounds with seeded random legal actions and returns each round's (deck, hands, actions).
+    '''
+    rng = random.Random(SEED)
+    rounds = []
+    for round_num in range(num_rounds):
+        deck = engine.pkrbot.Deck()
+        deck.rng.seed(engine.deal_seed(SEED, round_num))
+        deck.shuffle()
+        hands = [deck.deal(3), deck.deal(3)]
+        round_state = initial_state(deck, hands)
+        actions = []
+        while not isinstance(round_state, engine.TerminalState):
+            actions.append(scripted_action(round_state, rng))
+            round_state = round_state.proceed(actions[-1])
+        rounds.append((deck, hands, actions))
+    return rounds
+
+
+def scripted_action(round_state, rng):
+    '''
+    Picks a random legal action, raising to a random legal amount.
+    '''
+    legal_actions = round_state.legal_actions()
+    if engine.DiscardAction in legal_actions:
+        return engine.DiscardAction(rng.randrange(3))
+    action = rng.choice(sorted(legal_actions, key=lambda action: action.__name__))
+    if action is engine.RaiseAction:
+        min_raise, max_raise = round_state.raise_bounds()
+        return engine.RaiseAction(rng.randint(min_raise, max_raise))
+    if action is engine.FoldAction and rng.random() < 0.7:
+        # fold less often so more rounds reach the later streets
+        return engine.CheckAction() if engine.CheckAction in legal_actions else engine.CallAction()
+    return action()
+
+
+def initial_state(deck, hands):
+    '''
+    Returns the first state of a round, with fresh copies of the hands the round mutates.
+    '''
+    return engine.RoundState(0, 0, [engine.SMALL_BLIND, engine.BIG_BLIND],
+                             [engine.STARTING_STACK - engine.SMALL_BLIND, engine.STARTING_STACK - engine.BIG_BLIND],
+                             [list(hand) for hand in hands], deck, [])
+
+
+@benchmark('round_state.proceed', 'actions/s')
+def bench_proceed(min_time):
+    rounds = scripted_rounds(200)
+
+    def run():
+        operations = 0
+        for deck, hands, actions in rounds:
+            round_state = initial_state(deck, hands)
+            for action in actions:
+                round_state = round_state.proceed(action)
+            operations += len(actions)
+        return operations
+    return rate(run, min_time)
+
+
+def scripted_states():
+    '''
+    Returns every non-terminal state visited by the scripted rounds.
+    '''
+    states = []
+    for deck, hands, actions in scripted_rounds(200):
+        round_state = initial_state(deck, hands)
+        for action in actions:
+            # the engine mutates hands and board on discards, so keep a copy of each state
+            states.append(engine.RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
+                                            [list(hand) for hand in round_state.hands], deck, list(round_state.board)))
+            round_state = round_state.proceed(action)
+    return states
+
+
+@benchmark('round_state.legal_actions', 'calls/s')
+def bench_legal_actions(min_time):
+    states = scripted_states()
+
+    def run():
+        for round_state in states:
+            round_state.legal_actions()
+        return len(states)
+    return rate(run, min_time)
+
+
+@benchmark('round_state.raise_bounds', 'calls/s')
+def bench_raise_bounds(min_time):
+    states = [round_state for round_state in scripted_states() if engine.RaiseAction in round_state.legal_actions()]
+
+    def run():
+        for round_state in states:
+            round_state.raise_bounds()
+        return len(states)
+    return rate(run, min_time)
+
+
+class ScriptedPlayer(engine.Player):
+    '''
+    Stands in for a pokerbot with seeded random legal actions and no process or socket.
+    '''
+
+    def __init__(self, name, seed):
+        super().__init__(name, ROOT)
+        self.rng = random.Random(seed)
+
+    def query(self, round_state, player_message, game_log):
+        del player_message[1:]
+        if isinstance(round_state, engine.TerminalState):
+            return engine.CheckAction()
+        return scripted_action(round_state, self.rng)
+
+
+@benchmark('game.run_round', 'hands/s')
+def bench_run_round(min_time):
+    log_dir = tempfile.mkdtemp()
+    try:
+        game = engine.Game(SEED, os.path.join(log_dir, 'gamelog'))
+        players = [ScriptedPlayer(engine.PLAYER_1_NAME, SEED), ScriptedPlayer(engine.PLAYER_2_NAME, SEED + 1)]
+        progress = {'round_num': 0}
+
+        def run():
+            first_round = progress['round_num'] + 1
+            progress['round_num'] += 100
+            players[:] = game.play(players, first_round, progress['round_num'])
+            return 100
+        result = rate(run, min_time)
+        game.log.close()
+        if game.history is not None:
+            game.history.close()
+        return result
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+
+@benchmark('mc_equity', 'samples/s')
+def bench_mc_equity(min_time):
+    utils = load_module('bench_simple_bot_utils', 'simple_bot/utils.py')
+    random.seed(SEED)
+    equity.seed(SEED)  # the runouts come from equity's numpy stream
+
+    def run():
+        utils.mc_equity(['As', 'Kd'], ['2c', '7h', '9s', 'Td'], iters=2000)
+        return 2000
+    return rate(run, min_time)
+
+
+@benchmark('best_discard_index', 'samples/s')
+def bench_best_discard(min_time):
+    # every call misses a fresh oracle without a table or cache file, so this times the
+    # Monte Carlo path the pre-oracle baseline ran (lookups are best_discard_index.lookup)
+    import discard_oracle
+    discard = load_module('bench_discard', 'python_skeleton/fixed_actions/discard.py')
+    random.seed(SEED)
+    equity.seed(SEED)
+
+    def run():
+        discard_oracle._oracle = discard_oracle.DiscardOracle(table_path=None, cache_path=None)
+        discard.best_discard_index(['As', 'Kd', '7c'], ['2c', '9h'], iters=1000)
+        return 3 * 1000
+    try:
+        return rate(run, min_time)
+    finally:
+        discard_oracle._oracle = None
+
+
+@benchmark('best_discard_index.lookup', 'lookups/s')
+def bench_best_discard_lookup(min_time):
+    # the same call once the oracle holds the state
+    import discard_oracle
+    discard = load_module('bench_discard', 'python_skeleton/fixed_actions/discard.py')
+    discard_oracle._oracle = discard_oracle.DiscardOracle(table_path=None, cache_path=None)
+    equity.seed(SEED)
+    discard.best_discard_index(['As', 'Kd', '7c'], ['2c', '9h'], iters=100)
+
+    def run():
+        for _ in range(1000):
+            discard.best_discard_index(['As', 'Kd', '7c'], ['2c', '9h'])
+        return 1000
+    try:
+        return rate(run, min_time)
+    finally:
+        discard_oracle._oracle = None
+
+
+@benchmark('discard_oracle.sampled_equities', 'runouts/s')
+def bench_discard_miss(min_time):
+    # the Monte Carlo a discard oracle miss runs, on runouts shared by the three choices
+    import discard_oracle
+    random.seed(SEED)
+    equity.seed(SEED)
+
+    def run():
+        discard_oracle.sampled_equities([51, 11, 5], [0, 33], 1000)
+        return 1000
+    return rate(run, min_time)
+
+
+@benchmark('discard_oracle.lookup', 'lookups/s')
+def bench_discard_lookup(min_time):
+    import discard_oracle
+    oracle = discard_oracle.DiscardOracle(table_path=None, cache_path=None)
+    equity.seed(SEED)
+    states = [(['As', 'Kd', '7c'], ['2c', '9h']), (['Ah', 'Kc', '7d'], ['2d', '9s']), (['Kd', '7c', 'As'], ['9h', '2c', 'Ks'])]
+    for hand, board in states:
+        oracle.discard_equities(hand, board, iters=100)
+
+    def run():
+        for _ in range(1000):
+            for hand, board in states:
+                oracle.discard_equities(hand, board)
+        return 1000 * len(states)
+    return rate(run, min_time)
+
+
+def load_brain():
+    '''
+    Imports the python_skeleton brain, or returns None if torch is not installed.
+    '''
+    try:
+        import torch
+    except ImportError:
+        return None
+    bot_dir = os.path.join(ROOT, 'python_skeleton')
+    if bot_dir not in sys.path:
+        sys.path.insert(0, bot_dir)
+    torch.manual_seed(SEED)
+    from brain.agent import RLAgent
+    from brain.encoder import encode_state
+    return RLAgent, encode_state
+
+
+BRAIN_STATE = dict(my_cards=['As', 'Kd'], board=['2c', '7h', '9s', 'Td'], stacks=[380, 360], pips=[10, 30], street=4)
+
+
+@benchmark('encode_state', 'us/call', better='lower')
+def bench_encode_state(min_time):
+    brain = load_brain()
+    if brain is None:
+        return None
+    encode_state = brain[1]
+    state = BRAIN_STATE
+
+    def run():
+        for _ in range(100):
+            encode_state(state['my_cards'], state['board'], state['stacks'][0], state['stacks'][1],
+                         state['pips'][0], state['pips'][1], state['street'])
+        return 100
+    return 1e6 / rate(run, min_time)
+
+
+@benchmark('rl_agent.select_action', 'us/call', better='lower')
+def bench_select_action(min_time):
+    brain = load_brain()
+    if brain is None:
+        return None
+    agent = brain[0](training_mode=False, model_path=os.path.join(ROOT, 'python_skeleton', 'smart_brain.pth'))
+    legal_actions = {engine.FoldAction, engine.CallAction, engine.RaiseAction}
+
+    def run():
+        for _ in range(100):
+            agent.select_action(legal_actions=legal_actions, **BRAIN_STATE)
+        return 100
+    return 1e6 / rate(run, min_time)
+
+
+@benchmark('rl_agent.update_policy', 'steps/s')
+def bench_update_policy(min_time):
+    brain = load_brain()
+    if brain is None:
+        return None
+    agent = brain[0](training_mode=True, model_path=os.path.join(ROOT, 'python_skeleton', 'smart_brain.pth'))
+    legal_actions = {engine.FoldAction, engine.CallAction, engine.RaiseAction}
+    rng = random.Random(SEED)
+    best = 0.
+    for _ in range(3):
+        steps = 0
+        elapsed = 0.
+        while elapsed < min_time:
+            # a round's worth of decisions, then one policy update timed on its own
+            for _ in range(4):
+                agent.select_action(legal_actions=legal_actions, **BRAIN_STATE)
+            reward = rng.randint(-50, 50)
+            start_time = time.perf_counter()
+            agent.update_policy(reward)
+            elapsed += time.perf_counter() - start_time
+            steps += 1
+        best = max(best, steps / elapsed)
+    return best
+
+
+def run_benchmarks(names, min_time):
+    '''
+    Runs the named benchmarks and returns the results document.
+    '''
+    results = {}
+    for name in names:
+        function, unit, better = BENCHMARKS[name]
+        value = function(min_time)
+        if value is None:
+            print('{:<28} skipped'.format(name))
+            results[name] = {'value': None, 'unit': unit, 'better': better}
+        else:
+            print('{:<28} {:>14.2f} {}'.format(name, value, unit))
+            results[name] = {'value': value, 'unit': unit, 'better': better}
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': SEED,
+        'results': results,
+    }
+
+
+def compare(baseline, current, tolerance):
+    '''
+    Prints the change of every benchmark and returns the names of those that regressed.
+    '''
+    regressions = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None or reference['value'] is None or result['value'] is None:
+            print('{:<28} {:>14} {}'.format(name, 'n/a', '(missing or skipped)'))
+            continue
+        change = result['value'] / reference['value'] - 1 if reference['value'] else 0.
+        worse = -change if result['better'] == 'higher' else change
+        flag = ''
+        if worse > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('{:<28} {:>14.2f} -> {:>14.2f} {} ({:+.1f}%){}'.format(
+            name, reference['value'], result['value'], result['unit'], 100 * change, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python benchmark.py')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='Run the benchmarks and write the results')
+    run_parser.add_argument('names', nargs='*', help='Benchmarks to run, defaults to all: ' + ', '.join(BENCHMARKS))
+    run_parser.add_argument('-o', '--output', default='benchmark.json', help='Results file, defaults to benchmark.json')
+    run_parser.add_argument('--quick', action='store_true', help='Time each benchmark for 0.2s instead of 1s')
+    compare_parser = commands.add_parser('compare', help='Compare results against a baseline')
+    compare_parser.add_argument('baseline', help='Results file of the baseline run')
+    compare_parser.add_argument('current', nargs='?', help='Results file to check, or run the benchmarks now if omitted')
+    compare_parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed slowdown before flagging, defaults to 0.1')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        unknown = [name for name in args.names if name not in BENCHMARKS]
+        if unknown:
+            parser.error('unknown benchmarks: ' + ', '.join(unknown))
+        document = run_benchmarks(args.names or list(BENCHMARKS), 0.2 if args.quick else 1.)
+        with open(args.output, 'w') as results_file:
+            json.dump(document, results_file, indent=2)
+        print('Wrote', args.output)
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if args.current is not None:
+        with open(args.current) as current_file:
+            current = json.load(current_file)
+    else:
+        current = run_benchmarks([name for name in BENCHMARKS if name in baseline['results']], 1.)
+    regressions = compare(baseline, current, args.tolerance)
+    if regressions:
+        print('{} regression(s): {}'.format(len(regressions), ', '.join(regressions)))
+        return 1
+    print('No regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,14 +9,63 @@ PLAYER_2_NAME = "Sparring_RL_Clone"
 PLAYER_2_PATH = "./python_skeleton"
 # GAME PROGRESS IS RECORDED HERE
 GAME_LOG_FILENAME = "gamelog"
+# GAME_LOG_LEVEL "full" WRITES THE READABLE HAND-BY-HAND LOG, "tally" ONLY THE
+# SUMMARY NUMBERS AT THE END OF THE MATCH
+GAME_LOG_LEVEL = "full"
+# GAME_LOG_COMPRESSION IS None, "gzip" OR "zstd" (NEEDS THE zstandard PACKAGE)
+GAME_LOG_COMPRESSION = None
+# THE GAME LOG IS STREAMED TO DISK IN CHUNKS OF GAME_LOG_BUFFER_SIZE BYTES
+GAME_LOG_BUFFER_SIZE = 65536
+# HAND_HISTORY ALSO WRITES ONE JSON RECORD PER ROUND TO <GAME_LOG_FILENAME>.hands.jsonl
+# AND A FIXED-WIDTH INDEX OF BYTE OFFSETS AND DELTAS BY ROUND TO <...>.hands.idx
+# (READ THEM WITH hand_history.HandHistory)
+HAND_HISTORY = True
 # PLAYER_LOG_SIZE_LIMIT IS IN BYTES
 PLAYER_LOG_SIZE_LIMIT = 524288
+# ONCE A BOT'S OUTPUT PASSES THE LIMIT, ONLY ITS LAST PLAYER_LOG_TAIL_SIZE BYTES
+# ARE KEPT (INSIDE THE LIMIT) AND THE DROPPED BYTES IN BETWEEN ARE COUNTED
+PLAYER_LOG_TAIL_SIZE = 131072
 # STARTING_GAME_CLOCK AND TIMEOUTS ARE IN SECONDS
 # ENFORCE_GAME_CLOCK = True
 ENFORCE_GAME_CLOCK = False
 STARTING_GAME_CLOCK = 60.0
 BUILD_TIMEOUT = 10.0
 CONNECT_TIMEOUT = 10.0
+# TRANSPORT BETWEEN THE ENGINE AND EACH BOT: "tcp" (LOOPBACK PORT), "unix" (UNIX
+# DOMAIN SOCKET) OR "socketpair" (SOCKET INHERITED BY THE BOT). BOTS THAT DO NOT
+# LIST IT UNDER "transports" IN commands.json FALL BACK TO "tcp"
+TRANSPORT = "tcp"
+# HEADLESS LOADS BOTH (PYTHON) BOTS INTO THE ENGINE PROCESS INSTEAD OF
+# RUNNING THEM AS SUBPROCESSES CONNECTED OVER SOCKETS - MUCH FASTER FOR
+# LONG EVALUATION AND SELF-PLAY RUNS
+HEADLESS = False
+# MATCH_SHARDS > 1 SPLITS THE MATCH INTO THAT MANY BLOCKS OF CONSECUTIVE ROUNDS
+# PLAYED IN PARALLEL PROCESSES, EACH WITH ITS OWN PAIR OF BOTS. BOTS THAT KEEP
+# STATE ACROSS ROUNDS OPT OUT WITH "shardable": false IN commands.json
+MATCH_SHARDS = 1
+# NUM_MATCHES > 1 PLAYS THAT MANY CONSECUTIVE MATCHES OF NUM_ROUNDS ROUNDS, KEEPING
+# BOTS WITH "persistent": true IN commands.json RUNNING BETWEEN THEM INSTEAD OF
+# RESTARTING THEM FOR EVERY MATCH
+NUM_MATCHES = 1
+# async_engine.py PLAYS ASYNC_MATCHES INDEPENDENT MATCHES IN ONE PROCESS, AT MOST
+# ASYNC_CONCURRENCY OF THEM AT A TIME
+ASYNC_MATCHES = 16
+ASYNC_CONCURRENCY = 16
+# MATCH_SEED FIXES THE DEALS - ROUND N IS ALWAYS DEALT THE SAME WAY FOR A GIVEN
+# SEED. None PICKS A FRESH SEED, WHICH IS WRITTEN TO THE GAME LOG FOR REPLAYS
+MATCH_SEED = None
+# DUPLICATE_DEALS PLAYS EVERY DEAL TWICE WITH THE SEATS SWAPPED AND REPORTS THE
+# PAIRED DELTAS, CANCELLING MOST OF THE CARD LUCK BETWEEN THE TWO BOTS
+DUPLICATE_DEALS = False
+# NUMBER OF SLOWEST ROUNDS LISTED PER BOT IN THE LATENCY SUMMARY AT THE END OF
+# THE GAME LOG. BOTS MAY APPEND " t<SECONDS>" TO AN ACTION TO REPORT THEIR COMPUTE
+# TIME, SO THE SUMMARY CAN SPLIT LATENCY INTO BOT COMPUTE AND PROTOCOL OVERHEAD
+LATENCY_SLOWEST_ROUNDS = 5
+# EVERY CHECKPOINT_INTERVAL ROUNDS A SERIAL MATCH SAVES ITS PROGRESS TO
+# CHECKPOINT_NAME (0 TURNS CHECKPOINTS OFF). AFTER A CRASH OR CTRL-C,
+# python engine.py --resume RESTARTS THE BOTS AND CONTINUES FROM THERE
+CHECKPOINT_INTERVAL = 100
+CHECKPOINT_NAME = "gamelog.checkpoint.json"
 # THE GAME VARIANT FIXES THE PARAMETERS BELOW
 # CHANGE ONLY FOR TRAINING OR EXPERIMENTATION
 NUM_ROUNDS = 5000
@@ -0,0 +1,205 @@
+'''
+Cached discard decisions keyed by the canonical hand and board.
+
+The flop discards see a finite, heavily repeated set of states: the first discarder's
+3 cards and the 2 flop cards, and the second discarder's 3 cards, the flop and the
+opponent's discard (the third board card). The oracle maps a state to its isomorphism
+class and returns the equity of discarding each card, i.e. of keeping the other two with
+the discarded card on the board, against a random opponent pair:
+
+- discard_oracle.table holds the first discarder's classes, generated offline in
+  parallel and memory-mapped: fixed records sorted by key, found by binary search;
+- discard_oracle.cache holds every other state seen, appended by a bot as it estimates
+  them with Monte Carlo on a miss and loaded into a dict at startup, so a later match
+  starts with what earlier ones learned. It lives in the bot's working directory.
+
+A record is the 24-byte big-endian class key (isomorphism.index of the state times 4
+plus its number of groups) and the 3 equities as little-endian float32, one per card of
+the canonical hand in sorted order.
+
+The table is not shipped (about 46 MB) and takes hours on one core, so generate it once
+on a multi-core machine before a match:
+    python discard_oracle.py [--samples N] [--workers N] [--limit N]
+Without it every state is estimated on first sight, and the oracle says so.
+'''
+import argparse
+from itertools import combinations
+import mmap
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+import equity
+import hand_eval
+import isomorphism
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TABLE_PATH = os.path.join(ROOT, 'discard_oracle.table')
+CACHE_PATH = 'discard_oracle.cache'  # relative to the working directory the oracle starts in
+KEY_SIZE = 24
+EQUITIES = struct.Struct('<3f')
+RECORD_SIZE = KEY_SIZE + EQUITIES.size
+
+
+def state_groups(hand, board):
+    '''
+    Returns the card groups of a discard state: [hand, flop] or [hand, flop, opponent discard].
+    '''
+    return [hand, board[:2]] + ([board[2:]] if len(board) > 2 else [])
+
+
+def state_key(groups):
+    '''
+    Returns the record key of a discard state's class.
+    '''
+    return (isomorphism.index(groups) * 4 + len(groups)).to_bytes(KEY_SIZE, 'big')
+
+
+def sampled_equities(hand, board, iters):
+    '''
+    Estimates the equity of discarding each of the 3 cards of hand from iters runouts
+    shared by all three (see equity.discard_estimate).
+    '''
+    return equity.discard_estimate(hand, board, iters)[0]
+
+
+class DiscardOracle():
+    '''
+    Looks discard equities up in the offline table and the persistent cache.
+    '''
+
+    def __init__(self, table_path=TABLE_PATH, cache_path=CACHE_PATH):
+        # in-process bots change directory between queries, so keep the one they started in
+        self.cache_path = os.path.abspath(cache_path) if cache_path is not None else None
+        self.table = b''
+        if table_path is not None and os.path.exists(table_path) and os.path.getsize(table_path) > 0:
+            with open(table_path, 'rb') as table_file:
+                self.table = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        elif table_path is not None:
+            print('Discard oracle: {} not found - every discard is estimated with Monte Carlo '
+                  'until it is generated with python discard_oracle.py'.format(table_path))
+        self.table_size = len(self.table) // RECORD_SIZE
+        self.cache = {}
+        if self.cache_path is not None and os.path.exists(self.cache_path):
+            with open(self.cache_path, 'rb') as cache_file:
+                data = cache_file.read()
+            # a record cut short by a crash is dropped
+            for offset in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+                self.cache[data[offset:offset + KEY_SIZE]] = EQUITIES.unpack_from(data, offset + KEY_SIZE)
+
+    def search(self, key):
+        '''
+        Returns the canonical equities of a key from the table, or None.
+        '''
+        low, high = 0, self.table_size
+        while low < high:
+            middle = (low + high) // 2
+            offset = middle * RECORD_SIZE
+            middle_key = self.table[offset:offset + KEY_SIZE]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                return EQUITIES.unpack_from(self.table, offset + KEY_SIZE)
+        return None
+
+    def store(self, key, canonical_equities):
+        '''
+        Caches the canonical equities of a key and appends them to the cache file.
+        '''
+        self.cache[key] = canonical_equities
+        if self.cache_path is not None:
+            try:
+                # one small append per record keeps concurrent bots from interleaving them
+                with open(self.cache_path, 'ab') as cache_file:
+                    cache_file.write(key + EQUITIES.pack(*canonical_equities))
+            except OSError:
+                self.cache_path = None
+
+    def discard_equities(self, hand, board, iters=2000):
+        '''
+        Returns the equity of discarding each card of a 3-card hand on a 2-card flop, or on
+        the flop and the opponent's discard, in the order of hand. Estimates and caches the
+        state from iters shared runouts on a miss.
+        '''
+        hand = hand_eval.encode(hand)
+        board = hand_eval.encode(board)
+        groups = state_groups(hand, board)
+        key = state_key(groups)
+        canonical_equities = self.cache.get(key)
+        if canonical_equities is None:
+            canonical_equities = self.search(key)
+        relabel = isomorphism.suit_map(groups)
+        canonical_hand = [relabel[card // 13] * 13 + card % 13 for card in hand]
+        ordered = sorted(canonical_hand)
+        if canonical_equities is None:
+            equities = sampled_equities(hand, board, iters)
+            canonical_equities = tuple(equities[canonical_hand.index(card)] for card in ordered)
+            self.store(key, canonical_equities)
+            return equities
+        return [canonical_equities[ordered.index(card)] for card in canonical_hand]
+
+
+_oracle = None
+
+
+def discard_equities(hand, board, iters=2000):
+    '''
+    Returns DiscardOracle.discard_equities from an oracle shared by the whole process.
+    '''
+    global _oracle
+    if _oracle is None:
+        _oracle = DiscardOracle()
+    return _oracle.discard_equities(hand, board, iters)
+
+
+def first_discarder_classes():
+    '''
+    Returns the key and canonical representative of every first discarder class.
+    '''
+    classes = {}
+    for hand in combinations(range(52), 3):
+        flops = list(combinations([card for card in range(52) if card not in hand], 2))
+        hands = [hand] * len(flops)
+        for flop, class_index in zip(flops, isomorphism.index_many([hands, flops])):
+            key = (class_index * 4 + 2).to_bytes(KEY_SIZE, 'big')
+            if key not in classes:
+                classes[key] = isomorphism.canonicalize([list(hand), list(flop)])
+    return sorted(classes.items())
+
+
+def class_record(job):
+    '''
+    Estimates one class and returns its table record.
+    '''
+    key, (hand, flop), samples = job
+    return key + EQUITIES.pack(*sampled_equities(hand, flop, samples))
+
+
+def generate(samples=2000, workers=None, limit=None):
+    '''
+    Estimates the first discarder classes on a pool of worker processes and writes
+    discard_oracle.table. limit keeps only the first classes in key order.
+    '''
+    start_time = time.perf_counter()
+    classes = first_discarder_classes()[:limit]
+    jobs = [(key, groups, samples) for key, groups in classes]
+    handle, temp_path = tempfile.mkstemp(dir=ROOT)
+    with multiprocessing.Pool(workers) as pool, os.fdopen(handle, 'wb') as table_file:
+        for record in pool.imap(class_record, jobs, chunksize=64):
+            table_file.write(record)
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, TABLE_PATH)
+    print('Wrote {} classes x {} samples to {} in {:.1f}s'.format(
+        len(jobs), samples, TABLE_PATH, time.perf_counter() - start_time))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates the first discarder table of the discard oracle.')
+    parser.add_argument('--samples', type=int, default=2000, help='Monte Carlo runouts per class, shared by its discard choices')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--limit', type=int, default=None, help='only generate this many classes')
+    args = parser.parse_args()
+    generate(args.samples, args.workers, args.limit)
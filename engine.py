@@ -3,10 +3,17 @@
 DO NOT REMOVE, RENAME, OR EDIT THIS FILE
 '''
 from collections import namedtuple
-from threading import Thread
-from queue import Queue
+from collections import deque
+from array import array
+from contextlib import redirect_stdout
+from threading import Thread, Lock
+import importlib.util
+import traceback
+import io
 import time
 import math
+import heapq
+import argparse
 import json
 import subprocess
 import socket
@@ -14,9 +21,20 @@ import pkrbot ###import eval7, but better
 import sys
 import os
 import random
+import shutil
+import tempfile
+import gzip
+from concurrent.futures import ProcessPoolExecutor
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 sys.path.append(os.getcwd())
 from config import *
+ENGINE_DIR = os.path.dirname(os.path.abspath(__file__))
+import hand_history
+import hand_eval
 ###New action for discarding a card from your hand and adding it to the board
 DiscardAction = namedtuple('DiscardAction', ['card'])
 
@@ -32,9 +50,45 @@ STREET_NAMES = ['Flop', 'Discard 1', 'Discard 2', 'Turn', 'River']
 DECODE = {'F': FoldAction, 'C': CallAction, 'K': CheckAction, 'R': RaiseAction, 'D': DiscardAction}
 CCARDS = lambda cards: ','.join(map(str, cards))
 PCARDS = lambda cards: '[{}]'.format(' '.join(map(str, cards))) ### Changed from PCARDS = lambda cards: '[{}]'.format(' '.join(map(str, cards)))
+LATENCY_STREETS = {0: 'Preflop', 2: 'Discard 1', 3: 'Discard 2', 4: 'Flop', 5: 'Turn', 6: 'River'}
+LATENCY_ACTIONS = {'F': 'fold', 'C': 'call', 'K': 'check', 'R': 'raise', 'D': 'discard'}
 PVALUE = lambda name, value: ', {} ({})'.format(name, value)
 STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
 
+
+def deal_seed(match_seed, deal_num):
+    '''
+    Returns the deck seed of one deal of a match, so any round can be replayed on its own.
+    '''
+    return random.Random('{}:{}'.format(match_seed, deal_num)).getrandbits(64)
+
+
+def deal_number(round_num):
+    '''
+    Returns the deal played in a round. In duplicate mode every deal is played twice in a
+    row; since seats swap every round, the second playing gives each bot the other seat.
+    '''
+    return (round_num + 1) // 2 if DUPLICATE_DEALS else round_num
+
+
+def paired_report(deal_deltas, name):
+    '''
+    Summarizes the per-deal totals of a duplicate match as log lines.
+    '''
+    paired = [sum(deltas) for deltas in deal_deltas.values() if len(deltas) == 2]
+    if len(paired) < 2:
+        return []
+    singles = [delta for deltas in deal_deltas.values() if len(deltas) == 2 for delta in deltas]
+    mean = sum(paired) / len(paired)
+    paired_error = math.sqrt(sum((x - mean) ** 2 for x in paired) / (len(paired) - 1) / len(paired))
+    single_mean = sum(singles) / len(singles)
+    single_error = 2 * math.sqrt(sum((x - single_mean) ** 2 for x in singles) / (len(singles) - 1) / len(singles))
+    return [
+        '{} duplicate deals: {} played twice with seats swapped'.format(name, len(paired)),
+        '{} paired delta per deal: {:.2f} +- {:.2f} (unpaired estimate +- {:.2f})'.format(
+            name, mean, paired_error, single_error),
+    ]
+
 # Socket encoding scheme:
 #
 # T#.### the player's game clock
@@ -48,19 +102,50 @@ STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
 # B**,**,**,**,**,** the board cards in common format
 # O**,**,** the opponent's hand in common format
 # A### the player's bankroll delta from the round
+# N a new match starts on this connection (only sent to "persistent" bots)
 # Q game over
 #
 # Clauses are separated by spaces
 # Messages end with '\n'
 # The engine expects a response of K at the end of the round as an ack,
 # otherwise a response which encodes the player's action
+# A response may end with ' t#.######', the seconds the bot spent computing it
 # Action history is sent once, including the player's actions
+# Bots with "coalesced_rounds": true in commands.json are not asked for the ack:
+# their O and A clauses are sent at the start of their next message instead
 
 
-class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks', 'hands', 'deck', 'board', 'previous_state'])):
+# legal action sets are shared constants, so legal_actions() allocates nothing
+DISCARD_ACTIONS = frozenset([DiscardAction])
+CHECK_ACTIONS = frozenset([CheckAction])
+CHECK_FOLD_ACTIONS = frozenset([CheckAction, FoldAction])
+CHECK_RAISE_FOLD_ACTIONS = frozenset([CheckAction, RaiseAction, FoldAction])
+FOLD_CALL_ACTIONS = frozenset([FoldAction, CallAction])
+FOLD_CALL_RAISE_ACTIONS = frozenset([FoldAction, CallAction, RaiseAction])
+
+
+class RoundState():
     '''
     Encodes the game tree for one round of poker.
+
+    A compact state with fixed __slots__ fields and pips/stacks held as (player 0, player 1)
+    tuples. States do not link back to the states before them: the only history kept is
+    TerminalState.previous_state, the last round state before the payoffs.
     '''
+    __slots__ = ('button', 'street', 'pips', 'stacks', 'hands', 'deck', 'board')
+
+    def __init__(self, button, street, pips, stacks, hands, deck, board):
+        self.button = button
+        self.street = street
+        self.pips = tuple(pips)
+        self.stacks = tuple(stacks)
+        self.hands = hands
+        self.deck = deck
+        self.board = board
+
+    def __repr__(self):
+        return 'RoundState(button={}, street={}, pips={}, stacks={}, hands={}, board={})'.format(
+            self.button, self.street, self.pips, self.stacks, self.hands, self.board)
 
     def get_delta(self, winner_index: int) -> int:
         '''Returns the delta for player A and -delta for player B.
@@ -108,8 +193,8 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
             This method assumes both players have equal stacks when reaching showdown,
             which is enforced by an assertion.
         '''
-        score0 = pkrbot.evaluate(self.board + self.hands[0])
-        score1 = pkrbot.evaluate(self.board + self.hands[1])
+        score0 = hand_eval.evaluate(hand_eval.encode(self.board + self.hands[0]))
+        score1 = hand_eval.evaluate(hand_eval.encode(self.board + self.hands[1]))
         assert(self.stacks[0] == self.stacks[1])
         if score0 > score1:
             delta = self.get_delta(0)
@@ -128,15 +213,15 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         active = self.button % 2
         continue_cost = self.pips[1-active] - self.pips[active]
         if self.street in (2, 3):
-            return {DiscardAction} if active != self.street % 2 else {CheckAction}
+            return DISCARD_ACTIONS if active != self.street % 2 else CHECK_ACTIONS
         if continue_cost == 0:
             # we can only raise the stakes if both players can afford it
             bets_forbidden = (self.stacks[0] == 0 or self.stacks[1] == 0)
-            return {CheckAction, FoldAction} if bets_forbidden else {CheckAction, RaiseAction, FoldAction}
+            return CHECK_FOLD_ACTIONS if bets_forbidden else CHECK_RAISE_FOLD_ACTIONS
         # continue_cost > 0
         # similarly, re-raising is only allowed if both players can afford it
         raises_forbidden = (continue_cost == self.stacks[active] or self.stacks[1-active] == 0)
-        return {FoldAction, CallAction} if raises_forbidden else {FoldAction, CallAction, RaiseAction}
+        return FOLD_CALL_ACTIONS if raises_forbidden else FOLD_CALL_RAISE_ACTIONS
 
     def raise_bounds(self):
         '''
@@ -148,6 +233,15 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         min_contribution = min(max_contribution, continue_cost + max(continue_cost, BIG_BLIND))
         return (self.pips[active] + min_contribution, self.pips[active] + max_contribution)
 
+    def contribute(self, active, contribution):
+        '''
+        Returns the pips and stacks after the active player puts more chips in the pot.
+        '''
+        pips, stacks = self.pips, self.stacks
+        if active == 0:
+            return (pips[0] + contribution, pips[1]), (stacks[0] - contribution, stacks[1])
+        return (pips[0], pips[1] + contribution), (stacks[0], stacks[1] - contribution)
+
     def proceed_street(self):
         '''
         Resets the players' pips and advances the game tree to the next round of betting and updates the board state.
@@ -172,7 +266,7 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
             button = 1
             self.board.append(self.deck.peek(new_street - 1)[new_street - 2])
 
-        return RoundState(button, new_street, [0, 0], self.stacks, self.hands, self.deck, self.board, self)
+        return RoundState(button, new_street, (0, 0), self.stacks, self.hands, self.deck, self.board)
 
     def proceed(self, action):
         '''
@@ -203,34 +297,106 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         if isinstance(action, DiscardAction):
             if len(self.hands[active]) != 0:
                 self.board.append(self.hands[active].pop(action.card))
-            state = RoundState((1 - active) % 2, self.street, self.pips, self.stacks, self.hands, self.deck, self.board, self)
-            return state
+            return RoundState((1 - active) % 2, self.street, self.pips, self.stacks, self.hands, self.deck, self.board)
         if isinstance(action, FoldAction):
             delta = self.get_delta((1 - active) % 2) # if active folds, the other player (1 - active) wins
             return TerminalState([delta, -delta], self)
         if isinstance(action, CallAction):
             if self.button == 0:  # sb calls bb
-                return RoundState(1, 0, [BIG_BLIND] * 2, [STARTING_STACK - BIG_BLIND] * 2, self.hands, self.deck, self.board,self)
+                return RoundState(1, 0, (BIG_BLIND, BIG_BLIND), (STARTING_STACK - BIG_BLIND, STARTING_STACK - BIG_BLIND), self.hands, self.deck, self.board)
             # both players acted
-            new_pips = list(self.pips)
-            new_stacks = list(self.stacks)
-            contribution = new_pips[1-active] - new_pips[active]
-            new_stacks[active] -= contribution
-            new_pips[active] += contribution
-            state = RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.board, self)
+            new_pips, new_stacks = self.contribute(active, self.pips[1-active] - self.pips[active])
+            state = RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.board)
             return state.proceed_street()
         if isinstance(action, CheckAction):
             if (self.street == 0 and self.button > 0) or self.button > 1 or self.street == 2 or self.street == 3:  # both players acted
                 return self.proceed_street()
             # let opponent act
-            return RoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.deck, self.board, self)
+            return RoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.deck, self.board)
         # isinstance(action, RaiseAction)
-        new_pips = list(self.pips)
-        new_stacks = list(self.stacks)
-        contribution = action.amount - new_pips[active]
-        new_stacks[active] -= contribution
-        new_pips[active] += contribution
-        return RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.board, self)
+        new_pips, new_stacks = self.contribute(active, action.amount - self.pips[active])
+        return RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.board)
+
+
+class OutputCapture():
+    '''
+    Streams a pokerbot's output to its log file, keeping at most PLAYER_LOG_SIZE_LIMIT bytes.
+
+    The first bytes go straight to disk; once the head is full only a bounded window of the
+    most recent output is held in memory, and it is written after a note of how many bytes
+    in between were dropped.
+    '''
+
+    def __init__(self, name, mode='wb'):
+        self.name = os.path.abspath(name)  # in-process bots write while the engine is in their directory
+        self.mode = mode
+        self.file = None
+        self.lock = Lock()
+        self.head_size = max(0, PLAYER_LOG_SIZE_LIMIT - PLAYER_LOG_TAIL_SIZE)
+        self.tail_size = PLAYER_LOG_SIZE_LIMIT - self.head_size
+        self.head_written = 0
+        self.tail = deque()
+        self.tail_bytes = 0
+        self.dropped = 0
+
+    def put(self, output):
+        '''
+        Captures a chunk of output bytes.
+        '''
+        if not output:
+            return
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.name, self.mode)
+            if self.head_written < self.head_size:
+                head = output[:self.head_size - self.head_written]
+                self.head_written += self.file.write(head)
+                output = output[len(head):]
+                if not output:
+                    return
+            self.tail.append(output)
+            self.tail_bytes += len(output)
+            while self.tail_bytes - len(self.tail[0]) >= self.tail_size:
+                self.tail_bytes -= len(self.tail[0])
+                self.dropped += len(self.tail.popleft())
+
+    def close(self):
+        '''
+        Writes the tail window and closes the log file. Returns the number of bytes dropped.
+        '''
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.name, self.mode)
+            tail = b''.join(self.tail)
+            self.dropped += len(tail) - min(len(tail), self.tail_size)
+            tail = tail[len(tail) - min(len(tail), self.tail_size):]
+            if self.dropped > 0:
+                self.file.write('\n[{} bytes of output dropped]\n'.format(self.dropped).encode())
+            self.file.write(tail)
+            self.file.close()
+            self.tail.clear()
+            return self.dropped
+
+    def checkpoint(self):
+        '''
+        Returns the byte counters to resume the log from. The tail window is not on disk yet,
+        so a resumed log counts it as dropped.
+        '''
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+            return {'head_written': self.head_written, 'dropped': self.dropped + self.tail_bytes}
+
+    def resume(self, counters):
+        '''
+        Appends to the log file from a checkpoint's counters, dropping whatever was written
+        after the checkpoint, so the whole log stays within PLAYER_LOG_SIZE_LIMIT.
+        '''
+        self.mode = 'ab'
+        self.head_written = counters['head_written']
+        self.dropped = counters['dropped']
+        if os.path.exists(self.name):
+            os.truncate(self.name, min(os.path.getsize(self.name), self.head_written))
 
 
 class Player():
@@ -238,19 +404,23 @@ class Player():
     Handles subprocess and socket interactions with one player's pokerbot.
     '''
 
-    def __init__(self, name, path):
+    def __init__(self, name, path, log_name=None):
         self.name = name
         self.path = path
+        self.log_name = log_name if log_name is not None else name
         self.game_clock = STARTING_GAME_CLOCK
+        self.latency = 0.
+        self.compute_time = None
+        self.pending = []  # end of round clauses held for the next message
         self.bankroll = 0
         self.commands = None
         self.bot_subprocess = None
         self.socketfile = None
-        self.bytes_queue = Queue()
+        self.output = OutputCapture(self.log_name + '.txt')
 
-    def build(self):
+    def load_commands(self):
         '''
-        Loads the commands file and builds the pokerbot.
+        Loads the commands file.
         '''
         try:
             with open(self.path + '/commands.json', 'r') as json_file:
@@ -265,66 +435,154 @@ class Player():
             print(self.name, 'commands.json not found - check PLAYER_PATH')
         except json.decoder.JSONDecodeError:
             print(self.name, 'commands.json misformatted')
+
+    def shardable(self):
+        '''
+        Whether the pokerbot may be split across parallel match shards.
+
+        A bot that carries state from one round to the next (learning, opponent modelling,
+        round_num-based schedules) opts out with "shardable": false in its commands.json.
+        '''
+        return self.commands is None or self.commands.get('shardable', True) is not False
+
+    def coalesces_rounds(self):
+        '''
+        Whether the pokerbot takes the end of round clauses with its next message instead of acking them.
+
+        Saves one round trip per round. Bots opt in with "coalesced_rounds": true in their commands.json.
+        '''
+        return self.commands is not None and self.commands.get('coalesced_rounds', False) is True
+
+    def persistent(self):
+        '''
+        Whether the pokerbot process may be kept running and reused for the next match.
+
+        Bots that reset themselves on the N clause opt in with "persistent": true in commands.json.
+        '''
+        return self.commands is not None and self.commands.get('persistent', False) is True
+
+    def build(self):
+        '''
+        Loads the commands file and builds the pokerbot.
+        '''
+        self.load_commands()
         if self.commands is not None and len(self.commands['build']) > 0:
             try:
                 proc = subprocess.run(self.commands['build'],
                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
                                       cwd=self.path, timeout=BUILD_TIMEOUT, check=False)
-                self.bytes_queue.put(proc.stdout)
+                self.output.put(proc.stdout)
             except subprocess.TimeoutExpired as timeout_expired:
                 error_message = 'Timed out waiting for ' + self.name + ' to build'
                 print(error_message)
-                self.bytes_queue.put(timeout_expired.stdout)
-                self.bytes_queue.put(error_message.encode())
+                self.output.put(timeout_expired.stdout)
+                self.output.put(error_message.encode())
             except (TypeError, ValueError):
                 print(self.name, 'build command misformatted')
             except OSError:
                 print(self.name, 'build failed - check "build" in commands.json')
 
+    def transport(self):
+        '''
+        Returns the configured TRANSPORT if the pokerbot supports it, otherwise "tcp".
+        '''
+        transports = self.commands.get('transports', ['tcp']) if self.commands is not None else ['tcp']
+        if TRANSPORT in transports and (TRANSPORT == 'tcp' or hasattr(socket, 'AF_UNIX')):
+            return TRANSPORT
+        return 'tcp'
+
+    def start(self, args, pass_fds=()):
+        '''
+        Launches the pokerbot subprocess with the given connection arguments.
+        '''
+        proc = subprocess.Popen(self.commands['run'] + args,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                cwd=self.path, pass_fds=pass_fds)
+        self.bot_subprocess = proc
+        # function for bot listening
+        def enqueue_output(out, queue):
+            try:
+                for line in out:
+                    if self.path == r"./player_chatbot":
+                        print(line.strip().decode("utf-8"))
+                    else:
+                        queue.put(line)
+            except ValueError:
+                pass
+        # start a separate bot listening thread which dies with the program
+        Thread(target=enqueue_output, args=(proc.stdout, self.output), daemon=True).start()
+
+    def connect(self, client_socket):
+        '''
+        Wraps the socket connected to the pokerbot.
+        '''
+        with client_socket:
+            if self.path == r"./player_chatbot":
+                client_socket.settimeout(PLAYER_TIMEOUT)
+            else:
+                client_socket.settimeout(CONNECT_TIMEOUT)
+            sock = client_socket.makefile('rw')
+            self.socketfile = sock
+
     def run(self):
         '''
         Runs the pokerbot and establishes the socket connection.
+
+        The connection is a loopback TCP socket whose port is passed on the command line, a
+        Unix domain socket passed as --unix PATH, or one end of a socketpair inherited by the
+        bot as --fd N, depending on TRANSPORT and the bot's "transports" in commands.json.
         '''
         if self.commands is not None and len(self.commands['run']) > 0:
+            transport = self.transport()
             try:
-                server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                with server_socket:
-                    server_socket.bind(('', 0))
-                    server_socket.settimeout(CONNECT_TIMEOUT)
-                    server_socket.listen()
-                    port = server_socket.getsockname()[1]
-                    proc = subprocess.Popen(self.commands['run'] + [str(port)],
-                                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                            cwd=self.path)
-                    self.bot_subprocess = proc
-                    # function for bot listening
-                    def enqueue_output(out, queue):
-                        try:
-                            for line in out:
-                                if self.path == r"./player_chatbot":
-                                    print(line.strip().decode("utf-8"))
-                                else:
-                                    queue.put(line)
-                        except ValueError:
-                            pass
-                    # start a separate bot listening thread which dies with the program
-                    Thread(target=enqueue_output, args=(proc.stdout, self.bytes_queue), daemon=True).start()
-                    # block until we timeout or the player connects
-                    client_socket, _ = server_socket.accept()
-                    with client_socket:
-                        if self.path == r"./player_chatbot":
-                            client_socket.settimeout(PLAYER_TIMEOUT)
+                if transport == 'socketpair':
+                    engine_socket, bot_socket = socket.socketpair()
+                    with bot_socket:
+                        self.start(['--fd', str(bot_socket.fileno())], pass_fds=(bot_socket.fileno(),))
+                    self.connect(engine_socket)
+                    # the bot announces itself once it has loaded, like a connect on the other transports
+                    try:
+                        ready = self.socketfile.readline()
+                    except OSError:
+                        self.socketfile.close()
+                        self.socketfile = None
+                        raise
+                    if ready.strip() != 'K':
+                        # the bot exited or crashed before it was ready
+                        self.socketfile.close()
+                        self.socketfile = None
+                        print(self.name, 'failed to connect - check "run" in commands.json')
+                        return
+                else:
+                    if transport == 'unix':
+                        socket_dir = tempfile.mkdtemp()
+                        address = os.path.join(socket_dir, 'bot.sock')
+                        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    else:
+                        address = ('', 0)
+                        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    with server_socket:
+                        server_socket.bind(address)
+                        server_socket.settimeout(CONNECT_TIMEOUT)
+                        server_socket.listen()
+                        if transport == 'unix':
+                            self.start(['--unix', address])
                         else:
-                            client_socket.settimeout(CONNECT_TIMEOUT)
-                        sock = client_socket.makefile('rw')
-                        self.socketfile = sock
-                        print(self.name, 'connected successfully')
+                            self.start([str(server_socket.getsockname()[1])])
+                        # block until we timeout or the player connects
+                        try:
+                            client_socket, _ = server_socket.accept()
+                        finally:
+                            if transport == 'unix':
+                                shutil.rmtree(socket_dir, ignore_errors=True)
+                        self.connect(client_socket)
+                print(self.name, 'connected successfully')
             except (TypeError, ValueError):
                 print(self.name, 'run command misformatted')
-            except OSError:
-                print(self.name, 'run failed - check "run" in commands.json')
             except socket.timeout:
                 print('Timed out waiting for', self.name, 'to connect')
+            except OSError:
+                print(self.name, 'run failed - check "run" in commands.json')
 
     def stop(self):
         '''
@@ -332,7 +590,7 @@ class Player():
         '''
         if self.socketfile is not None:
             try:
-                self.socketfile.write('Q\n')
+                self.socketfile.write(' '.join(self.pending + ['Q']) + '\n')
                 self.socketfile.close()
             except socket.timeout:
                 print('Timed out waiting for', self.name, 'to disconnect')
@@ -344,21 +602,35 @@ class Player():
                     outs, _ = self.bot_subprocess.communicate(timeout=PLAYER_TIMEOUT)
                 else:
                     outs, _ = self.bot_subprocess.communicate(timeout=CONNECT_TIMEOUT)
-                self.bytes_queue.put(outs)
+                self.output.put(outs)
             except subprocess.TimeoutExpired:
                 print('Timed out waiting for', self.name, 'to quit')
                 self.bot_subprocess.kill()
                 outs, _ = self.bot_subprocess.communicate()
-                self.bytes_queue.put(outs)
-        with open(self.name + '.txt', 'wb') as log_file:
-            bytes_written = 0
-            for output in self.bytes_queue.queue:
-                try:
-                    bytes_written += log_file.write(output)
-                    if bytes_written >= PLAYER_LOG_SIZE_LIMIT:
-                        break
-                except TypeError:
-                    pass
+                self.output.put(outs)
+        dropped = self.output.close()
+        if dropped > 0:
+            print(self.name, 'printed too much - dropped', dropped, 'bytes from', self.log_name + '.txt')
+
+    def new_match(self):
+        '''
+        Starts a new match on the running pokerbot and resets its match state.
+
+        Returns True once the pokerbot has acked the N clause. Otherwise it must be restarted.
+        '''
+        if self.socketfile is None or not self.persistent():
+            return False
+        try:
+            self.socketfile.write(' '.join(self.pending + ['N']) + '\n')
+            self.socketfile.flush()
+            if self.read_report(self.socketfile.readline()) != 'K':
+                return False
+        except (OSError, ValueError):
+            return False
+        self.pending = []
+        self.game_clock = STARTING_GAME_CLOCK
+        self.bankroll = 0
+        return True
 
     def query(self, round_state, player_message, game_log):
         '''
@@ -387,42 +659,29 @@ class Player():
             - At the end of a round, only CheckAction is considered legal
         '''
         legal_actions = round_state.legal_actions() if isinstance(round_state, RoundState) else {CheckAction}
+        self.latency = 0.
+        self.compute_time = None
         if self.socketfile is not None and self.game_clock > 0.:
             clause = ''
             try:
                 player_message[0] = 'T{:.3f}'.format(self.game_clock)
-                message = ' '.join(player_message) + '\n'
+                message = ' '.join(player_message[:1] + self.pending + player_message[1:]) + '\n'
                 del player_message[1:]  # do not send redundant action history
+                self.pending = []
                 start_time = time.perf_counter()
                 self.socketfile.write(message)
                 self.socketfile.flush()
-                clause = self.socketfile.readline().strip()
+                response = self.socketfile.readline()
                 end_time = time.perf_counter()
+                clause = self.read_report(response)
+                self.latency = end_time - start_time
                 if ENFORCE_GAME_CLOCK and self.path != r"./player_chatbot":
                     self.game_clock -= end_time - start_time
                 if self.game_clock <= 0.:
                     raise socket.timeout
-                action = DECODE[clause[0]]
-                if action in legal_actions:
-                    if clause[0] == 'R':
-                        amount = int(clause[1:])
-                        min_raise, max_raise = round_state.raise_bounds()
-                        if min_raise <= amount <= max_raise:
-                            return action(amount)
-                    elif clause[0] == 'D':
-                        card = int(clause[1:])
-                        if 0 <= card <= 2:
-                            return action(card)
-                        else:
-                            game_log.append(f"{self.name} attempted to discard invalid index {card}")
-                            # Invalid index - fall through to default action handling
-                        ###### index the player's hand 'D0', 'D1', or 'D2' ######
-                    else:
-                        return action()
-                else:
-                    # Action is not in legal_actions
-                    game_log.append(f"street = {round_state.street}")
-                    game_log.append(self.name + ' attempted illegal ' + action.__name__)
+                action = self.decode(clause, round_state, legal_actions, game_log)
+                if action is not None:
+                    return action
             except socket.timeout:
                 error_message = self.name + ' ran out of time'
                 game_log.append(error_message)
@@ -437,14 +696,334 @@ class Player():
                 game_log.append(self.name + ' response misformatted: ' + str(clause))
         return CheckAction() if CheckAction in legal_actions else FoldAction()
 
+    def read_report(self, response):
+        '''
+        Returns the action clause of a response and keeps the bot's self-reported compute time.
+
+        A response is an action clause, optionally followed by a space, 't' and the seconds
+        the bot spent choosing the action. Raises ValueError if the report is misformatted.
+        '''
+        clause, _, report = response.strip().partition(' ')
+        if report:
+            if report[0] != 't':
+                raise ValueError(report)
+            self.compute_time = float(report[1:])
+        return clause
+
+    def decode(self, clause, round_state, legal_actions, game_log):
+        '''
+        Decodes and validates the pokerbot's response.
+
+        Returns the action, or None if it was illegal. Raises IndexError, KeyError or
+        ValueError if the response is misformatted.
+        '''
+        action = DECODE[clause[0]]
+        if action in legal_actions:
+            if clause[0] == 'R':
+                amount = int(clause[1:])
+                min_raise, max_raise = round_state.raise_bounds()
+                if min_raise <= amount <= max_raise:
+                    return action(amount)
+            elif clause[0] == 'D':
+                card = int(clause[1:])
+                if 0 <= card <= 2:
+                    return action(card)
+                else:
+                    game_log.append(f"{self.name} attempted to discard invalid index {card}")
+                    # Invalid index - fall through to default action handling
+                ###### index the player's hand 'D0', 'D1', or 'D2' ######
+            else:
+                return action()
+        else:
+            # Action is not in legal_actions
+            game_log.append(f"street = {round_state.street}")
+            game_log.append(self.name + ' attempted illegal ' + action.__name__)
+        return None
+
+
+class InProcessChannel():
+    '''
+    Stands in for the socket file of a pokerbot hosted inside the engine process.
+    '''
+
+    def __init__(self, path, runner, output):
+        self.path = path
+        self.runner = runner
+        self.output = output
+        self.replies = io.StringIO()
+        self.broken = False
+        runner.socketfile = self.replies
+
+    def write(self, message):
+        '''
+        Hands one engine message straight to the bot's Runner and keeps its encoded reply.
+        '''
+        if self.broken:
+            raise OSError('bot crashed')
+        cwd = os.getcwd()
+        os.chdir(self.path)
+        try:
+            with redirect_stdout(self.output):
+                start_time = time.perf_counter()
+                action = self.runner.handle_packet(message.strip().split(' '))
+                if action is not None:
+                    self.runner.send(action, time.perf_counter() - start_time)
+        except Exception:
+            self.broken = True
+            self.output.write(traceback.format_exc())
+            raise OSError('bot crashed')
+        finally:
+            os.chdir(cwd)
+
+    def flush(self):
+        pass
+
+    def readline(self):
+        reply = self.replies.getvalue()
+        self.replies.seek(0)
+        self.replies.truncate()
+        return reply
+
+    def close(self):
+        pass
+
+
+class InProcessPlayer(Player):
+    '''
+    Hosts a Python pokerbot inside the engine process and calls its Runner directly.
+
+    Messages keep the socket encoding so Player.query and Game.run_round are shared with
+    subprocess bots, but no process, socket or per-action system call is involved.
+    '''
+
+    def __init__(self, name, path, log_name=None):
+        super().__init__(name, path, log_name)
+        self.runner = None
+
+    def write(self, text):
+        '''
+        Captures the bot's printed output for its log file.
+        '''
+        self.output.put(text.encode())
+
+    def flush(self):
+        pass
+
+    def run(self):
+        '''
+        Imports the pokerbot, constructs its Player and connects it to the engine.
+        '''
+        if self.commands is None:
+            return
+        scripts = [arg for arg in self.commands['run'] if arg.endswith('.py')]
+        if len(scripts) == 0:
+            print(self.name, 'cannot run in-process - "run" in commands.json has no Python file')
+            return
+        bot_dir = os.path.abspath(self.path)
+        saved_modules = set(sys.modules)
+        cwd = os.getcwd()
+        sys.path.insert(0, bot_dir)
+        os.chdir(bot_dir)
+        try:
+            with redirect_stdout(self):
+                spec = importlib.util.spec_from_file_location('player', os.path.join(bot_dir, scripts[0]))
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                self.runner = sys.modules['skeleton.runner'].Runner(module.Player(), None)
+        except Exception:
+            self.write(traceback.format_exc())
+            print(self.name, 'failed to load in-process')
+        finally:
+            os.chdir(cwd)
+            sys.path.remove(bot_dir)
+            # forget the modules the bot loaded from its own directory or from the engine's
+            # (equity, discard_oracle, ...), so a second bot imports fresh copies with module
+            # state of its own, as a separate process would
+            for module_name in set(sys.modules) - saved_modules:
+                module_file = os.path.abspath(getattr(sys.modules[module_name], '__file__', None) or '')
+                if module_file.startswith(bot_dir + os.sep) or os.path.dirname(module_file) == ENGINE_DIR:
+                    del sys.modules[module_name]
+        if self.runner is not None:
+            self.socketfile = InProcessChannel(os.path.abspath(self.path), self.runner, self)
+            print(self.name, 'loaded in-process')
+
+
+class GameLog():
+    '''
+    Streams the game log to disk through a bounded write buffer, optionally compressed.
+
+    Stands in for the list of lines the engine used to keep, so memory stays bounded and
+    everything logged before a crash is already on disk.
+    '''
+
+    def __init__(self, name, mode='w'):
+        compression = GAME_LOG_COMPRESSION
+        if compression == 'zstd' and zstandard is None:
+            print('zstandard is not installed - writing an uncompressed game log')
+            compression = None
+        self.name = name + '.txt' + {None: '', 'gzip': '.gz', 'zstd': '.zst'}[compression]
+        self.compression = compression
+        self.open(mode)
+
+    def open(self, mode):
+        if self.compression == 'gzip':
+            raw_file = gzip.open(self.name, mode + 'b')
+        elif self.compression == 'zstd':
+            raw_file = zstandard.ZstdCompressor().stream_writer(open(self.name, mode + 'b'))
+        else:
+            raw_file = open(self.name, mode + 'b')
+        self.file = io.TextIOWrapper(io.BufferedWriter(raw_file, GAME_LOG_BUFFER_SIZE), encoding='utf-8')
+
+    def checkpoint(self):
+        '''
+        Writes out everything logged so far and returns the size of the log file.
+
+        A compressed log ends its gzip member or zstd frame here, so the file can be truncated
+        back to this size and appended to on resume.
+        '''
+        if self.compression is None:
+            self.file.flush()
+        else:
+            self.file.close()
+            self.open('a')
+        return os.path.getsize(self.name)
+
+    def append(self, line):
+        self.file.write(line + '\n')
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class LatencyStats():
+    '''
+    Collects one pokerbot's query latencies, broken down by street and action.
+
+    Latency is the wall time of a query as the engine measures it. For queries the bot
+    answered with a self-reported compute time, the remainder is counted as protocol
+    overhead (message encoding, socket round trip and the bot's parsing).
+    '''
+
+    def __init__(self):
+        self.samples = {}  # (street, action) -> latencies in seconds
+        self.rounds = {}  # round number -> total latency
+        self.total = 0.
+        self.reported = 0.  # latency of the queries that came with a compute report
+        self.compute = 0.  # compute time reported for them
+
+    def record(self, street, action, round_num, latency, compute_time):
+        '''
+        Adds one query.
+        '''
+        key = (street, action)
+        if key not in self.samples:
+            self.samples[key] = array('d')
+        self.samples[key].append(latency)
+        self.rounds[round_num] = self.rounds.get(round_num, 0.) + latency
+        self.total += latency
+        if compute_time is not None:
+            self.reported += latency
+            self.compute += min(compute_time, latency)
+
+    def dump(self):
+        '''
+        Returns the collected queries as JSON-serializable data, for a checkpoint.
+        '''
+        return {
+            'samples': [[street, action, list(latencies)] for (street, action), latencies in self.samples.items()],
+            'rounds': [[round_num, latency] for round_num, latency in self.rounds.items()],
+            'total': self.total,
+            'reported': self.reported,
+            'compute': self.compute,
+        }
+
+    def load(self, data):
+        '''
+        Restores the queries of a dump.
+        '''
+        self.samples = {(street, action): array('d', latencies) for street, action, latencies in data['samples']}
+        self.rounds = {round_num: latency for round_num, latency in data['rounds']}
+        self.total = data['total']
+        self.reported = data['reported']
+        self.compute = data['compute']
+
+    def merge(self, other):
+        '''
+        Adds the queries collected by another LatencyStats, e.g. of a match shard.
+        '''
+        for key, latencies in other.samples.items():
+            self.samples.setdefault(key, array('d')).extend(latencies)
+        for round_num, latency in other.rounds.items():
+            self.rounds[round_num] = self.rounds.get(round_num, 0.) + latency
+        self.total += other.total
+        self.reported += other.reported
+        self.compute += other.compute
+
+    def report(self, name):
+        '''
+        Returns the game log lines summarizing the latencies of the named pokerbot.
+        '''
+        def percentile(values, fraction):
+            return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+        ms = lambda seconds: '{:.2f}ms'.format(1000 * seconds)
+        lines = ['{} latency: {} queries, {:.3f}s total'.format(
+            name, sum(len(latencies) for latencies in self.samples.values()), self.total)]
+        order = list(LATENCY_STREETS.values()) + ['End']
+        for street, action in sorted(self.samples, key=lambda key: (order.index(key[0]), key[1])):
+            latencies = sorted(self.samples[street, action])
+            lines.append('{}   {} {}: n={}, p50 {}, p95 {}, p99 {}, max {}'.format(
+                name, street, action, len(latencies), ms(percentile(latencies, 0.5)),
+                ms(percentile(latencies, 0.95)), ms(percentile(latencies, 0.99)), ms(latencies[-1])))
+        if self.reported > 0.:
+            overhead = self.reported - self.compute
+            lines.append('{} protocol overhead: {:.3f}s of {:.3f}s reported ({:.1f}%), bot compute {:.3f}s'.format(
+                name, overhead, self.reported, 100 * overhead / self.reported, self.compute))
+        else:
+            lines.append('{} reported no compute times'.format(name))
+        slowest = heapq.nlargest(LATENCY_SLOWEST_ROUNDS, self.rounds.items(), key=lambda item: item[1])
+        if slowest:
+            lines.append('{} slowest rounds: {}'.format(
+                name, ', '.join(['#{} {:.3f}s'.format(round_num, latency) for round_num, latency in slowest])))
+        return lines
+
 
 class Game():
     '''
     Manages logging and the high-level game procedure.
     '''
 
-    def __init__(self):
-        self.log = ['6.9630 MIT Pokerbots - ' + PLAYER_1_NAME + ' vs ' + PLAYER_2_NAME]
+    def __init__(self, seed=None, log_name=GAME_LOG_FILENAME, header=None, checkpoint=None):
+        self.checkpoint = checkpoint
+        self.checkpoint_name = None
+        if checkpoint is not None:
+            # drop whatever was logged after the checkpoint and continue from there
+            os.truncate(checkpoint['log_name'], checkpoint['log_offset'])
+            self.log = GameLog(log_name, 'a')
+            self.log.append('')
+            self.log.append('Resumed after round {}'.format(checkpoint['round_num']))
+        else:
+            self.log = GameLog(log_name)
+            self.log.extend(header if header is not None else ['6.9630 MIT Pokerbots - ' + PLAYER_1_NAME + ' vs ' + PLAYER_2_NAME])
+        self.history = None
+        if HAND_HISTORY:
+            if checkpoint is not None and checkpoint['history_offsets'] is not None:
+                hand_history.truncate(log_name, *checkpoint['history_offsets'])
+                self.history = hand_history.HandHistoryWriter(log_name, 'a')
+            else:
+                self.history = hand_history.HandHistoryWriter(log_name)
+        self.verbose = GAME_LOG_LEVEL != 'tally'
+        self.folded = False
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.deal_deltas = {}
+        self.latency_stats = {PLAYER_1_NAME: LatencyStats(), PLAYER_2_NAME: LatencyStats()}
         self.player_messages = [[], []]
         self.preflop_bets = {PLAYER_1_NAME: 0, PLAYER_2_NAME: 0}
         self.flop_bets = {PLAYER_1_NAME: 0, PLAYER_2_NAME: 0}
@@ -452,6 +1031,38 @@ class Game():
         self.ev_preflop_bets = {PLAYER_1_NAME: 0, PLAYER_2_NAME: 0}
         self.ev_flop_bets = {PLAYER_1_NAME: 0, PLAYER_2_NAME: 0}
         self.ev_turn_bets = {PLAYER_1_NAME: 0, PLAYER_2_NAME: 0}
+        if checkpoint is not None:
+            self.ev_preflop_bets = checkpoint['ev_preflop_bets']
+            self.ev_flop_bets = checkpoint['ev_flop_bets']
+            self.ev_turn_bets = checkpoint['ev_turn_bets']
+            self.deal_deltas = {int(deal_num): deltas for deal_num, deltas in checkpoint['deal_deltas'].items()}
+            for name, stats in checkpoint['latency_stats'].items():
+                self.latency_stats[name].load(stats)
+
+    def save_checkpoint(self, players, round_num):
+        '''
+        Records the match state after round_num so a crashed match can be resumed from it.
+
+        The file is replaced atomically, so a crash while writing keeps the previous checkpoint.
+        '''
+        checkpoint = {
+            'round_num': round_num,
+            'num_rounds': NUM_ROUNDS,
+            'seed': self.seed,
+            'players': {player.name: {'bankroll': player.bankroll, 'game_clock': player.game_clock,
+                                      'output': player.output.checkpoint()} for player in players},
+            'ev_preflop_bets': self.ev_preflop_bets,
+            'ev_flop_bets': self.ev_flop_bets,
+            'ev_turn_bets': self.ev_turn_bets,
+            'deal_deltas': self.deal_deltas,
+            'latency_stats': {name: stats.dump() for name, stats in self.latency_stats.items()},
+            'log_name': self.log.name,
+            'log_offset': self.log.checkpoint(),
+            'history_offsets': self.history.checkpoint() if self.history is not None else None,
+        }
+        with open(self.checkpoint_name + '.tmp', 'w') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(self.checkpoint_name + '.tmp', self.checkpoint_name)
 
     def log_round_state(self, players, round_state):
         '''
@@ -469,18 +1080,20 @@ class Game():
             
         
         if round_state.street == 0 and round_state.button == 0:
-            self.log.append('{} posts the blind of {}'.format(players[0].name, SMALL_BLIND))
-            self.log.append('{} posts the blind of {}'.format(players[1].name, BIG_BLIND))
-            self.log.append('{} dealt {}'.format(players[0].name, PCARDS(round_state.hands[0])))
-            self.log.append('{} dealt {}'.format(players[1].name, PCARDS(round_state.hands[1])))
+            if self.verbose:
+                self.log.append('{} posts the blind of {}'.format(players[0].name, SMALL_BLIND))
+                self.log.append('{} posts the blind of {}'.format(players[1].name, BIG_BLIND))
+                self.log.append('{} dealt {}'.format(players[0].name, PCARDS(round_state.hands[0])))
+                self.log.append('{} dealt {}'.format(players[1].name, PCARDS(round_state.hands[1])))
             self.player_messages[0] = ['T0.', 'P0', 'H' + CCARDS(round_state.hands[0]), 'G']
             self.player_messages[1] = ['T0.', 'P1', 'H' + CCARDS(round_state.hands[1]), 'G']
         elif (round_state.street > 0 and round_state.street != 3 and round_state.button == 1) or (round_state.street == 3 and round_state.button == 0):
             board = round_state.board
-            self.log.append(STREET_NAMES[round_state.street - 2] + ' ' + PCARDS(board) +
-                            PVALUE(players[0].name, STARTING_STACK-round_state.stacks[0]) +
-                            PVALUE(players[1].name, STARTING_STACK-round_state.stacks[1]))
-            self.log.append(f"Current stacks: {round_state.stacks[0]}, {round_state.stacks[1]}")
+            if self.verbose:
+                self.log.append(STREET_NAMES[round_state.street - 2] + ' ' + PCARDS(board) +
+                                PVALUE(players[0].name, STARTING_STACK-round_state.stacks[0]) +
+                                PVALUE(players[1].name, STARTING_STACK-round_state.stacks[1]))
+                self.log.append(f"Current stacks: {round_state.stacks[0]}, {round_state.stacks[1]}")
             compressed_board = 'B' + CCARDS(board)
             self.player_messages[0].append(compressed_board)
             self.player_messages[1].append(compressed_board)
@@ -488,7 +1101,9 @@ class Game():
     def log_action(self, name, action, bet_override, hand):
         '''
         Incorporates action information into the game log and player messages.
+        Returns the action's message code.
         '''
+        self.folded = isinstance(action, FoldAction)
         if isinstance(action, FoldAction):
             phrasing = ' folds'
             code = 'F'
@@ -499,97 +1114,407 @@ class Game():
             phrasing = ' checks'
             code = 'K'
         elif isinstance(action, DiscardAction):
-            phrasing = ' discards ' + str(hand[action.card])
+            phrasing = ' discards '
             code = 'D' + str(action.card)
         else:  # isinstance(action, RaiseAction)
-            phrasing = (' bets ' if bet_override else ' raises to ') + str(action.amount)
+            phrasing = ' bets ' if bet_override else ' raises to '
             code = 'R' + str(action.amount)
-        self.log.append(name + phrasing)
+        if self.verbose:
+            if isinstance(action, DiscardAction):
+                phrasing += str(hand[action.card])
+            elif isinstance(action, RaiseAction):
+                phrasing += str(action.amount)
+            self.log.append(name + phrasing)
         self.player_messages[0].append(code)
         self.player_messages[1].append(code)
+        return code
 
     def log_terminal_state(self, players, round_state):
         '''
         Incorporates TerminalState information into the game log and player messages.
         '''
         previous_state = round_state.previous_state
-        if not self.log[-1].endswith(' folds'):
-            self.log.append('{} shows {}'.format(players[0].name, PCARDS(previous_state.hands[0])))
-            self.log.append('{} shows {}'.format(players[1].name, PCARDS(previous_state.hands[1])))
+        if not self.folded:
+            if self.verbose:
+                self.log.append('{} shows {}'.format(players[0].name, PCARDS(previous_state.hands[0])))
+                self.log.append('{} shows {}'.format(players[1].name, PCARDS(previous_state.hands[1])))
             self.player_messages[0].append('O' + CCARDS(previous_state.hands[1]))
             self.player_messages[1].append('O' + CCARDS(previous_state.hands[0]))
-        self.log.append('{} awarded {}'.format(players[0].name, round_state.deltas[0]))
-        self.log.append('{} awarded {}'.format(players[1].name, round_state.deltas[1]))
+        if self.verbose:
+            self.log.append('{} awarded {}'.format(players[0].name, round_state.deltas[0]))
+            self.log.append('{} awarded {}'.format(players[1].name, round_state.deltas[1]))
         self.player_messages[0].append('A' + str(round_state.deltas[0]))
         self.player_messages[1].append('A' + str(round_state.deltas[1]))
 
-    def run_round(self, players):
+    def round_queries(self, players, seed=None, round_num=0):
         '''
-        Runs one round of poker.
+        Plays one round of poker, dealing from a deck shuffled with the given seed.
+
+        Generator that yields (player, round_state, player_message) whenever a pokerbot
+        must be queried and expects the player's action to be sent back, so the same
+        round logic drives both blocking and asyncio queries.
         '''
         deck = pkrbot.Deck()
+        if seed is not None:
+            deck.rng.seed(seed)
         deck.shuffle()
         hands = [deck.deal(3), deck.deal(3)]
         board = []
         pips = [SMALL_BLIND, BIG_BLIND]
         stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
-        round_state = RoundState(0, 0, pips, stacks, hands, deck, board, None)
+        round_state = RoundState(0, 0, pips, stacks, hands, deck, board)
+        record = None
+        if self.history is not None:
+            record = {'round': round_num, 'seed': seed, 'players': [player.name for player in players],
+                      'hands': [list(map(str, hand)) for hand in hands], 'actions': []}
         while not isinstance(round_state, TerminalState):
             self.log_round_state(players, round_state)
             active = round_state.button % 2
             player = players[active]
-            action = player.query(round_state, self.player_messages[active], self.log)
-            bet_override = (round_state.pips == [0, 0])
-            self.log_action(player.name, action, bet_override, round_state.hands[active])
+            action = yield player, round_state, self.player_messages[active]
+            bet_override = (round_state.pips == (0, 0))
+            code = self.log_action(player.name, action, bet_override, round_state.hands[active])
+            self.latency_stats[player.name].record(LATENCY_STREETS[round_state.street], LATENCY_ACTIONS[code[0]],
+                                                   round_num, player.latency, player.compute_time)
+            if record is not None:
+                compute_time = None if player.compute_time is None else round(player.compute_time, 6)
+                record['actions'].append([active, code, round(player.latency, 6), compute_time])
             round_state = round_state.proceed(action)
         self.log_terminal_state(players, round_state)
+        if record is not None:
+            record['board'] = list(map(str, board))
+            record['deltas'] = round_state.deltas
+            deltas = round_state.deltas if players[0].name == PLAYER_1_NAME else round_state.deltas[::-1]
+            self.history.write(record, deltas)
         for i in range(len(players)):
             multiplier = 1 if round_state.deltas[i] > 0 else (0 if round_state.deltas[i] == 0 else -1)
             self.ev_preflop_bets[players[i].name] += multiplier * self.preflop_bets[players[i].name]
             self.ev_flop_bets[players[i].name] += multiplier * self.flop_bets[players[i].name]
             self.ev_turn_bets[players[i].name] += multiplier * self.turn_bets[players[i].name]
         for player, player_message, delta in zip(players, self.player_messages, round_state.deltas):
-            player.query(round_state, player_message, self.log)
+            if player.coalesces_rounds():
+                player.pending = player_message[1:]
+            else:
+                yield player, round_state, player_message
+                self.latency_stats[player.name].record('End', 'ack', round_num, player.latency, player.compute_time)
             player.bankroll += delta
 
+    def answer_queries(self, queries):
+        '''
+        Answers the queries of a round_queries or match_queries generator with blocking
+        Player.query calls and returns the generator's result.
+        '''
+        action = None
+        while True:
+            try:
+                player, round_state, player_message = queries.send(action)
+            except StopIteration as stop:
+                return stop.value
+            action = player.query(round_state, player_message, self.log)
+
+    def run_round(self, players, seed=None, round_num=0):
+        '''
+        Runs one round of poker, dealing from a deck shuffled with the given seed.
+        '''
+        self.answer_queries(self.round_queries(players, seed, round_num))
+
+    def match_queries(self, players, first_round, last_round):
+        '''
+        Plays rounds first_round to last_round inclusive, checkpointing every
+        CHECKPOINT_INTERVAL rounds, and returns the reseated players.
+
+        Generator that yields the queries of every round like round_queries, so blocking and
+        asyncio matches share the match bookkeeping as well.
+        '''
+        for round_num in range(first_round, last_round + 1):
+            if self.verbose:
+                self.log.append('')
+                self.log.append('Round #' + str(round_num) + STATUS(players))
+            deal_num = deal_number(round_num)
+            reference = players[0] if players[0].name == PLAYER_1_NAME else players[1]
+            bankroll = reference.bankroll
+            yield from self.round_queries(players, deal_seed(self.seed, deal_num), round_num)
+            if DUPLICATE_DEALS:
+                self.deal_deltas.setdefault(deal_num, []).append(reference.bankroll - bankroll)
+            players = players[::-1]
+            if self.checkpoint_name is not None and round_num % CHECKPOINT_INTERVAL == 0 and round_num < last_round:
+                self.save_checkpoint(players, round_num)
+        return players
+
+    def play(self, players, first_round, last_round):
+        '''
+        Plays rounds first_round to last_round inclusive and returns the reseated players.
+        '''
+        return self.answer_queries(self.match_queries(players, first_round, last_round))
+
+    def resume(self, players):
+        '''
+        Restores the players' bankrolls, game clocks and logs from the checkpoint and returns
+        them seated for the round after it, with that round's number.
+        '''
+        for player in players:
+            player.bankroll = self.checkpoint['players'][player.name]['bankroll']
+            player.game_clock = self.checkpoint['players'][player.name]['game_clock']
+            player.output.resume(self.checkpoint['players'][player.name]['output'])  # keep what the bot printed before the crash
+        first_round = self.checkpoint['round_num'] + 1
+        if first_round % 2 == 0:
+            players = players[::-1]  # keep the seating of an uninterrupted match
+        return players, first_round
+
+    def log_summary(self, players, bankrolls):
+        '''
+        Appends the final bankrolls and per-street EV tallies to the game log.
+        '''
+        self.log.append('')
+        self.log.append('Final' + ''.join([PVALUE(player.name, bankrolls[player.name]) for player in players]))
+        for player in players:
+            self.log.append('{} preflop bets EV: {}'.format(player.name, self.ev_preflop_bets[player.name]))
+            self.log.append('{} flop bets EV: {}'.format(player.name, self.ev_flop_bets[player.name]))
+            self.log.append('{} turn bets EV: {}'.format(player.name, self.ev_turn_bets[player.name]))
+        self.log.extend(paired_report(self.deal_deltas, PLAYER_1_NAME))
+        for player in players:
+            self.log.extend(self.latency_stats[player.name].report(player.name))
+
     def run(self):
         '''
         Runs one game of poker.
+
+        Checkpoints the match to CHECKPOINT_NAME every CHECKPOINT_INTERVAL rounds. A game
+        constructed from a checkpoint restarts the bots and continues after its round.
         '''
-        print('   __  _____________  ___       __           __        __    ')
-        print('  /  |/  /  _/_  __/ / _ \\___  / /_____ ____/ /  ___  / /____')
-        print(' / /|_/ // /  / /   / ___/ _ \\/  \'_/ -_) __/ _ \\/ _ \\/ __(_-<')
-        print('/_/  /_/___/ /_/   /_/   \\___/_/\\_\\\\__/_/ /_.__/\\___/\\__/___/')
-        print()
-        print('Starting the Pokerbots engine...')
+        print_banner()
+        player_class = InProcessPlayer if HEADLESS else Player
         players = [
-            Player(PLAYER_1_NAME, PLAYER_1_PATH),
-            Player(PLAYER_2_NAME, PLAYER_2_PATH)
+            player_class(PLAYER_1_NAME, PLAYER_1_PATH),
+            player_class(PLAYER_2_NAME, PLAYER_2_PATH)
         ]
 
         for player in players:
             player.build()
+        first_round = 1
+        if self.checkpoint is not None:
+            players, first_round = self.resume(players)
         for player in players:
             player.run()
-        for round_num in range(1, NUM_ROUNDS + 1):
-            self.log.append('')
-            self.log.append('Round #' + str(round_num) + STATUS(players))
-            self.run_round(players)
-            players = players[::-1]
-            
-        self.log.append('')
-        self.log.append('Final' + STATUS(players))
-        
-        for player in players:
-            self.log.append('{} preflop bets EV: {}'.format(player.name, self.ev_preflop_bets[player.name]))
-            self.log.append('{} flop bets EV: {}'.format(player.name, self.ev_flop_bets[player.name]))
-            self.log.append('{} turn bets EV: {}'.format(player.name, self.ev_turn_bets[player.name]))
-            player.stop()
-        name = GAME_LOG_FILENAME + '.txt'
-        print('Writing', name)
-        with open(name, 'w') as log_file:
-            log_file.write('\n'.join(self.log))
+        if self.checkpoint is None:
+            self.log.append('Deals seeded with {}{}'.format(self.seed, ', each played twice' if DUPLICATE_DEALS else ''))
+        if CHECKPOINT_INTERVAL > 0:
+            self.checkpoint_name = CHECKPOINT_NAME
+        try:
+            players = self.play(players, first_round, NUM_ROUNDS)
+            self.log_summary(players, {player.name: player.bankroll for player in players})
+            for player in players:
+                player.stop()
+            if self.checkpoint_name is not None and os.path.exists(self.checkpoint_name):
+                os.remove(self.checkpoint_name)
+        finally:
+            print('Writing', self.log.name)
+            self.log.close()
+            if self.history is not None:
+                self.history.close()
+
+
+def load_checkpoint(name=CHECKPOINT_NAME):
+    '''
+    Reads the checkpoint of an interrupted match, or returns None if it cannot be resumed.
+    '''
+    try:
+        with open(name) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except FileNotFoundError:
+        print('No checkpoint found at', name)
+        return None
+    if checkpoint['num_rounds'] != NUM_ROUNDS or set(checkpoint['players']) != {PLAYER_1_NAME, PLAYER_2_NAME}:
+        print(name, 'was written for a different match - check NUM_ROUNDS and the player names')
+        return None
+    return checkpoint
+
+
+def print_banner():
+    '''
+    Prints the engine banner.
+    '''
+    print('   __  _____________  ___       __           __        __    ')
+    print('  /  |/  /  _/_  __/ / _ \\___  / /_____ ____/ /  ___  / /____')
+    print(' / /|_/ // /  / /   / ___/ _ \\/  \'_/ -_) __/ _ \\/ _ \\/ __(_-<')
+    print('/_/  /_/___/ /_/   /_/   \\___/_/\\_\\\\__/_/ /_.__/\\___/\\__/___/')
+    print()
+    print('Starting the Pokerbots engine...')
+
+
+def run_matches():
+    '''
+    Plays NUM_MATCHES consecutive matches, keeping persistent pokerbots warm between them.
+
+    A persistent pokerbot is launched once and reset with an N clause before every later
+    match; any other pokerbot is restarted. Each match writes its own game log, and each
+    pokerbot process logs to the player log of the match that launched it.
+    '''
+    print_banner()
+    player_class = InProcessPlayer if HEADLESS else Player
+    bots = [
+        player_class(PLAYER_1_NAME, PLAYER_1_PATH, PLAYER_1_NAME + '.match0'),
+        player_class(PLAYER_2_NAME, PLAYER_2_PATH, PLAYER_2_NAME + '.match0')
+    ]
+    for bot in bots:
+        bot.build()
+    startup_times = {}
+    saved_times = {bot.name: 0. for bot in bots}
+    warm_matches = {bot.name: 0 for bot in bots}
+    results = []
+    for match in range(NUM_MATCHES):
+        for i, bot in enumerate(bots):
+            if match > 0:
+                start_time = time.perf_counter()
+                if bot.new_match():
+                    saved_times[bot.name] += startup_times[bot.name] - (time.perf_counter() - start_time)
+                    warm_matches[bot.name] += 1
+                    continue
+                bot.stop()
+                bots[i] = bot = player_class(bot.name, bot.path, '{}.match{}'.format(bot.name, match))
+                bot.load_commands()
+            start_time = time.perf_counter()
+            bot.run()
+            startup_times[bot.name] = time.perf_counter() - start_time
+        seed = None if MATCH_SEED is None else deal_seed(MATCH_SEED, 'match{}'.format(match))
+        game = Game(seed, '{}.match{}'.format(GAME_LOG_FILENAME, match))
+        game.log.append('Deals seeded with {}{}'.format(game.seed, ', each played twice' if DUPLICATE_DEALS else ''))
+        try:
+            players = game.play(list(bots), 1, NUM_ROUNDS)
+            bankrolls = {player.name: player.bankroll for player in players}
+            game.log_summary(players, bankrolls)
+        finally:
+            game.log.close()
+            if game.history is not None:
+                game.history.close()
+        print('Match {}{}'.format(match, ''.join([PVALUE(bot.name, bankrolls[bot.name]) for bot in bots])))
+        results.append(bankrolls)
+    for bot in bots:
+        bot.stop()
+    print('Total' + ''.join([PVALUE(bot.name, sum(bankrolls[bot.name] for bankrolls in results)) for bot in bots]))
+    for bot in bots:
+        if warm_matches[bot.name] > 0:
+            print('{} kept warm for {} of {} matches - saved about {:.2f}s of startup'.format(
+                bot.name, warm_matches[bot.name], NUM_MATCHES, saved_times[bot.name]))
+
+
+def run_shard(shard, first_round, last_round, seed):
+    '''
+    Plays one shard of a parallel match with its own pair of pokerbots.
+
+    Runs in a worker process. The bots are already built, so only their commands are loaded.
+    The shard's game log is written to its own file and the tallies are returned for merging.
+    '''
+    player_class = InProcessPlayer if HEADLESS else Player
+    players = [
+        player_class(PLAYER_1_NAME, PLAYER_1_PATH, '{}.shard{}'.format(PLAYER_1_NAME, shard)),
+        player_class(PLAYER_2_NAME, PLAYER_2_PATH, '{}.shard{}'.format(PLAYER_2_NAME, shard))
+    ]
+    for player in players:
+        player.load_commands()
+        player.run()
+    if first_round % 2 == 0:
+        players = players[::-1]  # keep the seating of the serial schedule
+    game = Game(seed, '{}.shard{}'.format(GAME_LOG_FILENAME, shard),
+                ['', 'Shard {} - rounds {} to {} (bankrolls relative to the shard start)'.format(shard, first_round, last_round)])
+    players = game.play(players, first_round, last_round)
+    for player in players:
+        player.stop()
+    game.log.close()
+    if game.history is not None:
+        game.history.close()
+    return {
+        'log_name': game.log.name,
+        'bankrolls': {player.name: player.bankroll for player in players},
+        'ev_preflop_bets': game.ev_preflop_bets,
+        'ev_flop_bets': game.ev_flop_bets,
+        'ev_turn_bets': game.ev_turn_bets,
+        'deal_deltas': game.deal_deltas,
+        'latency_stats': game.latency_stats,
+    }
+
+
+def run_parallel():
+    '''
+    Splits one match into MATCH_SHARDS shards of consecutive rounds, plays them in a
+    process pool and merges bankrolls, EV tallies and logs into a single report. Shards
+    share the match seed, so every round is dealt exactly as in a serial match.
+    '''
+    print_banner()
+    players = [Player(PLAYER_1_NAME, PLAYER_1_PATH), Player(PLAYER_2_NAME, PLAYER_2_PATH)]
+    for player in players:
+        player.build()
+    opted_out = [player.name for player in players if not player.shardable()]
+    if len(opted_out) > 0:
+        print(', '.join(opted_out), 'opted out of sharding - playing the match serially')
+        Game(MATCH_SEED).run()
+        return
+    num_shards = max(1, min(MATCH_SHARDS, NUM_ROUNDS))
+    game = Game(MATCH_SEED)
+    bounds = [1 + NUM_ROUNDS * shard // num_shards for shard in range(num_shards + 1)]
+    if DUPLICATE_DEALS:
+        # keep both playings of a deal in the same shard
+        bounds = [bound - (bound - 1) % 2 for bound in bounds[:-1]] + [NUM_ROUNDS + 1]
+    with ProcessPoolExecutor(max_workers=num_shards) as pool:
+        futures = [pool.submit(run_shard, shard, bounds[shard], bounds[shard + 1] - 1, game.seed)
+                   for shard in range(num_shards)]
+        results = [future.result() for future in futures]
+
+    bankrolls = {player.name: 0 for player in players}
+    for result in results:
+        for name in bankrolls:
+            bankrolls[name] += result['bankrolls'][name]
+            game.ev_preflop_bets[name] += result['ev_preflop_bets'][name]
+            game.ev_flop_bets[name] += result['ev_flop_bets'][name]
+            game.ev_turn_bets[name] += result['ev_turn_bets'][name]
+            game.latency_stats[name].merge(result['latency_stats'][name])
+        game.deal_deltas.update(result['deal_deltas'])
+    if NUM_ROUNDS % 2 == 1:
+        players = players[::-1]
+    game.log.append('Deals seeded with {}{}'.format(game.seed, ', each played twice' if DUPLICATE_DEALS else ''))
+    game.log.append('Played in {} parallel shards'.format(num_shards))
+    for shard, result in enumerate(results):
+        game.log.append('Shard {} (rounds {} to {}){}'.format(
+            shard, bounds[shard], bounds[shard + 1] - 1,
+            ''.join([PVALUE(player.name, result['bankrolls'][player.name]) for player in players])))
+    print('Writing', game.log.name)
+    game.log.close()
+    # compressed shard logs are self-contained gzip members / zstd frames, so they concatenate too
+    with open(game.log.name, 'ab') as log_file:
+        for result in results:
+            with open(result['log_name'], 'rb') as shard_file:
+                shutil.copyfileobj(shard_file, log_file)
+            os.remove(result['log_name'])
+    game.log = GameLog(GAME_LOG_FILENAME, 'a')
+    game.log_summary(players, bankrolls)
+    game.log.close()
+    if game.history is not None:
+        game.history.close()
+        hand_history.merge(['{}.shard{}'.format(GAME_LOG_FILENAME, shard) for shard in range(num_shards)], GAME_LOG_FILENAME)
+    for player in players:
+        with open(player.log_name + '.txt', 'wb') as log_file:
+            bytes_written = 0
+            for shard in range(num_shards):
+                shard_name = '{}.shard{}.txt'.format(player.name, shard)
+                if not os.path.exists(shard_name):
+                    continue
+                with open(shard_name, 'rb') as shard_file:
+                    if bytes_written < PLAYER_LOG_SIZE_LIMIT:
+                        bytes_written += log_file.write(shard_file.read(PLAYER_LOG_SIZE_LIMIT - bytes_written))
+                os.remove(shard_name)
 
 
 if __name__ == '__main__':
-    Game().run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(prog='python engine.py')
+    parser.add_argument('--resume', action='store_true', help='Continue an interrupted match from its last checkpoint')
+    args = parser.parse_args()
+    if args.resume:
+        checkpoint = load_checkpoint()
+        if checkpoint is not None:
+            Game(checkpoint['seed'], checkpoint=checkpoint).run()
+    elif MATCH_SHARDS > 1:
+        run_parallel()
+    elif NUM_MATCHES > 1:
+        run_matches()
+    else:
+        Game(MATCH_SEED).run()
@@ -0,0 +1,728 @@
+'''
+Hand equity for the bots: the chance of beating the opponent's hand at showdown.
+
+Monte Carlo draws runouts thousands at a time as numpy arrays and scores them with
+hand_eval.evaluate_many (a plain loop without numpy). On late streets exact enumerates every
+runout instead, against cached per-board tables, and strength picks the cheaper of the
+two. anytime samples in growing batches and stops once the estimate is clear of the
+decision thresholds, precise enough or out of time. EquityCache, shared as cache, keeps
+estimates across decisions and tops them up rather than starting over.
+
+discard_estimate scores a hand's three discard choices on the same runouts, so their
+differences carry little noise. range_equity and anytime can also play against a
+weighted range over PAIRS, which narrow reweights after each opponent action.
+
+Large queries are split across worker processes once a bot starts a pool (WORK and run,
+see equity_pool.py); seed makes in-process sampling repeatable. Cards may be integers
+(suit * 13 + rank), pkrbot Cards or strings like "Ah".
+'''
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import combinations
+from math import comb
+import math
+import random
+import time
+import hand_eval
+import isomorphism
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+FINAL_BOARD_CARDS = 6  # Toss/Hold'em ends with 6 community cards
+BOARD_CACHE_SIZE = 256  # final boards whose opponent values are kept, about 10 KB each
+# one sampled runout costs about as much as scoring this many hands for a board table
+SAMPLE_COST = 2.5
+CACHE_SIZE = 4096  # (hand, board, opponent) estimates kept by an EquityCache
+ANYTIME_BATCH = 64  # runouts anytime draws first
+SETTLED_Z = 2.0  # standard errors between an estimate and every threshold to settle a decision
+# how a betting action reweights an opponent holding by the strength percentile of its made
+# hand on the board (0 weakest, 1 strongest): (floor, slope, power) gives
+# floor + slope * percentile ** power
+RANGE_ACTIONS = {
+    'raise': (0.05, 1.0, 2),  # bets and raises come from strong hands
+    'call': (0.25, 1.0, 1),  # calls lean strong
+    'check': (1.0, -0.5, 1),  # checks lean weak, strong hands sometimes trap
+}
+
+PAIRS = list(combinations(range(52), 2))
+# CARD_PAIRS[card] holds the indices in PAIRS of the 51 pairs holding card
+CARD_PAIRS = [[] for _ in range(52)]
+for _i, (_first, _second) in enumerate(PAIRS):
+    CARD_PAIRS[_first].append(_i)
+    CARD_PAIRS[_second].append(_i)
+del _i, _first, _second
+
+_rng = numpy.random.default_rng() if numpy is not None else random.Random()
+pool = None  # the equity_pool.EquityPool large queries are split across, once one is started
+DIFFERENCE_PAIRS = [(0, 1), (0, 2), (1, 2)]
+_board_tables = OrderedDict()  # sorted final board -> (values by pair, sorted values)
+if numpy is not None:
+    PAIR_ARRAY = numpy.array(PAIRS, dtype=numpy.intp)
+
+
+def seed(value=None):
+    '''
+    Reseeds the module-wide random stream that estimates draw from when given no rng.
+    '''
+    global _rng
+    _rng = numpy.random.default_rng(value) if numpy is not None else random.Random(value)
+
+
+def unseen(known):
+    '''
+    Returns the card integers not in known, in order.
+    '''
+    known = set(known)
+    return [card for card in range(52) if card not in known]
+
+
+def draw(deck, count, iters, rng):
+    '''
+    Returns an (iters, count) array with count distinct cards of deck in every row.
+    '''
+    cards = numpy.tile(numpy.asarray(deck, dtype=numpy.intp), (iters, 1))
+    rows = numpy.arange(iters)
+    for i in range(count):
+        j = rng.integers(i, len(deck), size=iters)
+        picked = cards[rows, j]
+        cards[rows, j] = cards[rows, i]
+        cards[rows, i] = picked
+    return cards[:, :count]
+
+
+def outcomes(my_cards, board, iters, rng=None):
+    '''
+    Plays iters random runouts of the board against a random opponent hand.
+
+    Returns the result of every runout, 1 for a win, 0.5 for a tie and 0 for a loss, as a
+    numpy array (a list without numpy). rng is a numpy Generator (a random.Random without
+    numpy) and defaults to a module-wide one.
+    '''
+    my_cards = hand_eval.encode(my_cards)
+    board = hand_eval.encode(board)
+    deck = unseen(my_cards + board)
+    need_board = max(0, FINAL_BOARD_CARDS - len(board))
+    rng = rng if rng is not None else _rng
+    if numpy is None:
+        results = []
+        for _ in range(iters):
+            sample = rng.sample(deck, need_board + 2)
+            full_board = board + sample[:need_board]
+            my_value = hand_eval.evaluate(my_cards + full_board)
+            opp_value = hand_eval.evaluate(sample[need_board:] + full_board)
+            results.append(1.0 if my_value > opp_value else (0.5 if my_value == opp_value else 0.))
+        return results
+    drawn = draw(deck, need_board + 2, iters, rng)
+    full_board = numpy.concatenate([numpy.broadcast_to(numpy.asarray(board, dtype=numpy.intp), (iters, len(board))),
+                                    drawn[:, :need_board]], axis=1)
+    my_values = hand_eval.evaluate_many(numpy.concatenate(
+        [numpy.broadcast_to(numpy.asarray(my_cards, dtype=numpy.intp), (iters, len(my_cards))), full_board], axis=1))
+    opp_values = hand_eval.evaluate_many(numpy.concatenate([drawn[:, need_board:], full_board], axis=1))
+    return (my_values > opp_values) + 0.5 * (my_values == opp_values)
+
+
+def discard_outcomes(hand, board, iters, rng=None):
+    '''
+    Plays iters random runouts for every card of a 3-card hand discarded to board, sharing
+    them: the discarded card is known in every case, so all three leave the same unseen
+    cards, and each sample of the remaining board and opponent pair is scored for all three
+    kept pairs (common random numbers).
+
+    Returns the results as a (3, iters) numpy array (3 lists without numpy), one row per
+    discarded card in the order of hand.
+    '''
+    hand = hand_eval.encode(hand)
+    board = hand_eval.encode(board)
+    deck = unseen(hand + board)
+    need_board = max(0, FINAL_BOARD_CARDS - len(board) - 1)
+    rng = rng if rng is not None else _rng
+    if numpy is None:
+        results = [[], [], []]
+        for _ in range(iters):
+            sample = rng.sample(deck, need_board + 2)
+            for i in range(3):
+                full_board = board + [hand[i]] + sample[:need_board]
+                my_value = hand_eval.evaluate(hand[:i] + hand[i + 1:] + full_board)
+                opp_value = hand_eval.evaluate(sample[need_board:] + full_board)
+                results[i].append(1.0 if my_value > opp_value else (0.5 if my_value == opp_value else 0.))
+        return results
+    drawn = draw(deck, need_board + 2, iters, rng)
+    hands = []
+    opp_hands = []
+    for i in range(3):
+        known = numpy.asarray(board + [hand[i]], dtype=numpy.intp)
+        full_board = numpy.concatenate([numpy.broadcast_to(known, (iters, len(known))), drawn[:, :need_board]], axis=1)
+        kept = numpy.asarray(hand[:i] + hand[i + 1:], dtype=numpy.intp)
+        hands.append(numpy.concatenate([numpy.broadcast_to(kept, (iters, 2)), full_board], axis=1))
+        opp_hands.append(numpy.concatenate([drawn[:, need_board:], full_board], axis=1))
+    # one batch for all six hands of every sample
+    values = hand_eval.evaluate_many(numpy.concatenate(hands + opp_hands)).reshape(6, iters)
+    return (values[:3] > values[3:]) + 0.5 * (values[:3] == values[3:])
+
+
+def discard_estimate(hand, board, iters=2000, rng=None, deadline=None):
+    '''
+    Returns the equity of discarding each card of a 3-card hand to board, in the order of
+    hand, and for each card the mean and standard error of its paired difference from the
+    best card's results, from iters shared runouts (see discard_outcomes).
+    '''
+    sums = run('discard', (hand, board), iters, rng, deadline)
+    equities = [summarize_sums(row)[0] for row in sums[:3]]
+    best = equities.index(max(equities))
+    differences = []
+    for i in range(3):
+        if i == best:
+            differences.append((0., 0.))
+            continue
+        mean, stderr = summarize_sums(sums[3 + DIFFERENCE_PAIRS.index((min(i, best), max(i, best)))])
+        differences.append((mean if i < best else -mean, stderr))
+    return equities, differences
+
+
+def outcome_sums(my_hole2, board, iters, rng=None):
+    '''
+    Returns [[runouts, sum, sum of squares]] of iters runouts of outcomes.
+    '''
+    sums = [0, 0., 0.]
+    accumulate(sums, outcomes(my_hole2, board, iters, rng))
+    return [sums]
+
+
+def discard_sums(hand, board, iters, rng=None):
+    '''
+    Returns [runouts, sum, sum of squares] of each row of iters discard_outcomes runouts,
+    then of the paired differences of the rows in DIFFERENCE_PAIRS.
+    '''
+    results = discard_outcomes(hand, board, iters, rng)
+    rows = list(results)
+    for first, second in DIFFERENCE_PAIRS:
+        if numpy is not None:
+            rows.append(results[first] - results[second])
+        else:
+            rows.append([mine - theirs for mine, theirs in zip(results[first], results[second])])
+    sums = []
+    for row in rows:
+        sums.append([0, 0., 0.])
+        accumulate(sums[-1], row)
+    return sums
+
+
+def range_sums(my_cards, board, totals, iters, rng=None):
+    '''
+    Returns [[runouts, sum, sum of squares]] of iters runouts of range_outcomes.
+    '''
+    sums = [0, 0., 0.]
+    accumulate(sums, range_outcomes(my_cards, board, totals, iters, rng))
+    return [sums]
+
+
+# the work a query can be split into: name -> function(*args, iters, rng) returning sums
+WORK = {'outcomes': outcome_sums, 'range': range_sums, 'discard': discard_sums}
+
+
+def run(kind, args, iters, rng=None, deadline=None):
+    '''
+    Runs a WORK query of iters runouts, split across the worker pool when one is running,
+    the query is large enough and no rng was given, and returns its sums added up. Workers
+    that have not answered by the time.perf_counter() deadline are left out.
+    '''
+    if pool is not None and rng is None and iters >= pool.min_split:
+        return pool.run(kind, args, iters, deadline)
+    return WORK[kind](*args, iters, rng)
+
+
+def summarize(results):
+    '''
+    Returns the mean of runout results and its standard error.
+    '''
+    count = len(results)
+    if count == 0:
+        return 0., 0.
+    if numpy is not None:
+        results = numpy.asarray(results, dtype=float)
+        mean = float(results.mean())
+        variance = float(results.var(ddof=1)) if count > 1 else 0.
+    else:
+        mean = sum(results) / count
+        variance = sum((result - mean) ** 2 for result in results) / (count - 1) if count > 1 else 0.
+    return mean, math.sqrt(variance / count)
+
+
+def accumulate(sums, results):
+    '''
+    Adds runout results to [runouts, sum, sum of squares].
+    '''
+    if numpy is not None:
+        results = numpy.asarray(results, dtype=float)
+        sums[1] += float(results.sum())
+        sums[2] += float(numpy.square(results).sum())
+    else:
+        sums[1] += sum(results)
+        sums[2] += sum(result * result for result in results)
+    sums[0] += len(results)
+
+
+def add_sums(sums, other):
+    '''
+    Adds [runouts, sum, sum of squares] other into sums.
+    '''
+    for i in range(3):
+        sums[i] += other[i]
+
+
+def summarize_sums(sums):
+    '''
+    Returns the mean and standard error of [runouts, sum, sum of squares].
+    '''
+    count, total, squares = sums
+    if count == 0:
+        return 0., 0.
+    mean = total / count
+    variance = max(0., squares - total * mean) / (count - 1) if count > 1 else 0.
+    return mean, math.sqrt(variance / count)
+
+
+def settled(mean, stderr, target_stderr, thresholds):
+    '''
+    Returns whether an estimate is good enough: its standard error is within the target, or
+    every decision threshold is more than SETTLED_Z standard errors away from it.
+    '''
+    if target_stderr is not None and stderr <= target_stderr:
+        return True
+    return len(thresholds) > 0 and all(abs(mean - threshold) > SETTLED_Z * stderr for threshold in thresholds)
+
+
+def anytime(my_hole2, board, target_stderr=None, thresholds=(), deadline=None, max_iters=10000, rng=None,
+            sums=None, weights=None):
+    '''
+    Samples runouts in batches, ANYTIME_BATCH first and then as many as it already has so
+    each numpy call pays off, until the estimate is settled (see settled),
+    the time.perf_counter() deadline passes or max_iters runouts are in, and returns the
+    equity, its standard error and the number of runouts behind them. With neither a target
+    nor thresholds it runs to the deadline or max_iters. sums, [runouts, sum, sum of
+    squares], starts it from earlier runouts and is updated in place. With weights the
+    opponent holds a pair of that range (see range_outcomes) instead of a random hand.
+    Batches go through run, so once they reach the pool's min_split they are split across
+    its workers, whose answers are merged up to the deadline.
+    '''
+    my_cards = hand_eval.encode(my_hole2)
+    board = hand_eval.encode(board)
+    totals = cumulative(live_range(my_cards, board, weights)) if weights is not None else None
+    sums = sums if sums is not None else [0, 0., 0.]
+    while True:
+        mean, stderr = summarize_sums(sums)
+        if sums[0] >= max_iters or (sums[0] >= ANYTIME_BATCH and (
+                settled(mean, stderr, target_stderr, thresholds)
+                or (deadline is not None and time.perf_counter() >= deadline))):
+            return mean, stderr, sums[0]
+        batch = min(max(ANYTIME_BATCH, sums[0]), max_iters - sums[0])
+        if totals is None:
+            add_sums(sums, run('outcomes', (my_cards, board), batch, rng, deadline)[0])
+        else:
+            add_sums(sums, run('range', (my_cards, board, totals), batch, rng, deadline)[0])
+
+
+def estimate(my_hole2, board, iters=500, rng=None, deadline=None):
+    '''
+    Returns the equity of my_hole2 on board against a random hand and its standard error.
+    '''
+    return summarize_sums(run('outcomes', (my_hole2, board), iters, rng, deadline)[0])
+
+
+def mc_equity(my_hole2, board, iters=500):
+    '''
+    Returns the equity of my_hole2 on board against a random hand from iters runouts.
+    '''
+    return estimate(my_hole2, board, iters)[0]
+
+
+def board_table(board):
+    '''
+    Returns the value of every opponent pair on a final board, -1 for pairs that overlap it,
+    and the sorted values of the others, building and caching them on first use.
+    '''
+    key = tuple(sorted(board))
+    table = _board_tables.get(key)
+    if table is not None:
+        _board_tables.move_to_end(key)
+        return table
+    on_board = set(key)
+    valid = [i for i, (first, second) in enumerate(PAIRS) if first not in on_board and second not in on_board]
+    if numpy is not None:
+        hands = numpy.concatenate([PAIR_ARRAY[valid],
+                                   numpy.broadcast_to(numpy.asarray(key, dtype=numpy.intp), (len(valid), len(key)))],
+                                  axis=1)
+        valid_values = hand_eval.evaluate_many(hands).tolist()
+    else:
+        valid_values = hand_eval.evaluate_many([list(PAIRS[i]) + list(key) for i in valid])
+    values = array('i', [-1]) * len(PAIRS)
+    for i, value in zip(valid, valid_values):
+        values[i] = value
+    table = (values, array('i', sorted(valid_values)))
+    _board_tables[key] = table
+    if len(_board_tables) > BOARD_CACHE_SIZE:
+        _board_tables.popitem(last=False)
+    return table
+
+
+def final_board_equity(my_cards, board):
+    '''
+    Returns the exact equity of two card integers on a final board against every opponent pair.
+    '''
+    values, sorted_values = board_table(board)
+    my_value = hand_eval.evaluate(my_cards + board)
+    below = bisect_left(sorted_values, my_value)
+    equal = bisect_right(sorted_values, my_value) - below
+    total = len(sorted_values)
+    # take back the pairs that hold one of my cards
+    for i in set(CARD_PAIRS[my_cards[0]] + CARD_PAIRS[my_cards[1]]):
+        value = values[i]
+        if value >= 0:
+            total -= 1
+            if value < my_value:
+                below -= 1
+            elif value == my_value:
+                equal -= 1
+    return (below + 0.5 * equal) / total
+
+
+def exact(my_hole2, board):
+    '''
+    Returns the exact equity of my_hole2 on board against a random hand, enumerating every
+    runout and opponent holding, and its standard error, which is 0.
+    '''
+    my_cards = hand_eval.encode(my_hole2)
+    board = hand_eval.encode(board)
+    need_board = FINAL_BOARD_CARDS - len(board)
+    if need_board <= 0:
+        return final_board_equity(my_cards, board), 0.
+    # every runout leaves the opponent the same number of pairs, so runouts weigh the same
+    runouts = list(combinations(unseen(my_cards + board), need_board))
+    return sum(final_board_equity(my_cards, board + list(runout)) for runout in runouts) / len(runouts), 0.
+
+
+def exact_cost(my_hole2, board):
+    '''
+    Returns about how many hands exact has to score for my_hole2 on board, counting the
+    opponent pairs of every final board it has not cached yet.
+    '''
+    board = hand_eval.encode(board)
+    need_board = FINAL_BOARD_CARDS - len(board)
+    pairs = comb(52 - FINAL_BOARD_CARDS, 2)
+    if need_board <= 0:
+        return 0 if tuple(sorted(board)) in _board_tables else pairs
+    deck = unseen(hand_eval.encode(my_hole2) + board)
+    if need_board == 1:
+        return sum(1 + (0 if tuple(sorted(board + [card])) in _board_tables else pairs) for card in deck)
+    return comb(len(deck), need_board) * (1 + pairs)
+
+
+def strength(my_hole2, board, iters=500):
+    '''
+    Returns the equity of my_hole2 on board against a random hand and its standard error,
+    enumerated exactly when that costs no more than iters sampled runouts.
+    '''
+    if exact_cost(my_hole2, board) <= SAMPLE_COST * iters:
+        return exact(my_hole2, board)
+    return estimate(my_hole2, board, iters)
+
+
+class EquityCache():
+    '''
+    Bounded LRU cache of equity estimates with hit, miss and eviction counters.
+
+    An entry keeps the number of runouts and the sum and sum of squares of their results,
+    so a query asking for more runouts than are stored samples only the difference and
+    adds it in (counted as a top-up). Exact results are final. opponent names the opponent
+    model; only None, a random hand, is suit symmetric, so any other is keyed on the actual
+    cards, the board in the order it was dealt, rather than their class.
+    '''
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> [runouts (None if exact), sum, sum of squares]
+        self.hits = 0
+        self.top_ups = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def entry(self, my_cards, board, opponent):
+        '''
+        Returns the entry of a query, creating it and evicting the oldest one on a miss.
+        '''
+        if opponent is None:
+            key = (isomorphism.index([my_cards, board]), None)
+        else:
+            key = (tuple(sorted(my_cards)), tuple(board), opponent)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        entry = self.entries[key] = [0, 0., 0.]
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def estimate(self, my_hole2, board, iters=500, opponent=None, rng=None):
+        '''
+        Returns the equity of my_hole2 on board and its standard error from at least iters runouts.
+        '''
+        my_cards = hand_eval.encode(my_hole2)
+        board = hand_eval.encode(board)
+        misses = self.misses
+        entry = self.entry(my_cards, board, opponent)
+        if entry[0] is None:
+            self.hits += 1
+            return entry[1], 0.
+        if entry[0] < iters:
+            if self.misses == misses:
+                self.top_ups += 1
+            add_sums(entry, run('outcomes', (my_cards, board), iters - entry[0], rng)[0])
+        else:
+            self.hits += 1
+        return summarize_sums(entry)
+
+    def anytime(self, my_hole2, board, target_stderr=None, thresholds=(), deadline=None, max_iters=10000,
+                weights=None, opponent=None):
+        '''
+        Returns anytime(...) through the cache, starting from the stored runouts, or the
+        exact equity (behind 0 runouts) when enumerating costs no more than max_iters runouts.
+        With weights it plays against that opponent range, and opponent must name the range,
+        e.g. by the actions that narrowed it.
+        '''
+        if weights is not None and opponent is None:
+            raise ValueError('an opponent range needs an opponent key')
+        my_cards = hand_eval.encode(my_hole2)
+        board = hand_eval.encode(board)
+        if weights is None and exact_cost(my_cards, board) <= SAMPLE_COST * max_iters:
+            return self.strength(my_cards, board, max_iters) + (0,)
+        misses = self.misses
+        entry = self.entry(my_cards, board, opponent)
+        count = entry[0]
+        if count is None:
+            self.hits += 1
+            return entry[1], 0., 0
+        if exact_cost(my_cards, board) <= SAMPLE_COST * max_iters:
+            if self.misses == misses:
+                self.top_ups += 1
+            entry[:] = [None, range_equity(my_cards, board, weights, max_iters)[0], 0.]
+            return entry[1], 0., 0
+        result = anytime(my_cards, board, target_stderr, thresholds, deadline, max_iters, sums=entry, weights=weights)
+        if entry[0] == count:
+            self.hits += 1
+        elif self.misses == misses:
+            self.top_ups += 1
+        return result
+
+    def strength(self, my_hole2, board, iters=500):
+        '''
+        Returns strength(my_hole2, board, iters) through the cache.
+        '''
+        my_cards = hand_eval.encode(my_hole2)
+        board = hand_eval.encode(board)
+        if exact_cost(my_cards, board) > SAMPLE_COST * iters:
+            return self.estimate(my_cards, board, iters)
+        misses = self.misses
+        entry = self.entry(my_cards, board, None)
+        if entry[0] is None:
+            self.hits += 1
+        else:
+            if self.misses == misses:
+                self.top_ups += 1
+            entry[:] = [None, exact(my_cards, board)[0], 0.]
+        return entry[1], 0.
+
+    def report(self, reset=False):
+        '''
+        Returns a one line summary of the counters, optionally starting them over.
+        '''
+        summary = 'Equity cache: {} hits, {} top-ups, {} misses, {} evictions, {} entries'.format(
+            self.hits, self.top_ups, self.misses, self.evictions, len(self.entries))
+        if reset:
+            self.hits = self.top_ups = self.misses = self.evictions = 0
+        return summary
+
+
+cache = EquityCache()
+
+
+def uniform_range():
+    '''
+    Returns a range with the same weight on every pair in PAIRS.
+    '''
+    return numpy.ones(len(PAIRS)) if numpy is not None else [1.] * len(PAIRS)
+
+
+def blocked(cards):
+    '''
+    Returns the indices in PAIRS of the pairs holding any of cards.
+    '''
+    indices = set()
+    for card in cards:
+        indices.update(CARD_PAIRS[card])
+    return list(indices)
+
+
+def narrow(weights, board, action):
+    '''
+    Returns a copy of a range reweighted by one opponent betting action, a key of
+    RANGE_ACTIONS, on a board of 3 to 6 cards. Pairs are ranked by the made hand they
+    form with the board; pairs the board blocks keep their weight (they never count).
+    '''
+    board = hand_eval.encode(board)
+    floor, slope, power = RANGE_ACTIONS[action]
+    dead = set(blocked(board))
+    free = [i for i in range(len(PAIRS)) if i not in dead]
+    if len(board) < hand_eval.MIN_CARDS - 2:
+        values = [0] * len(free)
+    elif numpy is not None:
+        values = hand_eval.evaluate_many(numpy.concatenate(
+            [PAIR_ARRAY[free], numpy.broadcast_to(numpy.asarray(board, dtype=numpy.intp), (len(free), len(board)))],
+            axis=1))
+    else:
+        values = hand_eval.evaluate_many([list(PAIRS[i]) + board for i in free])
+    if numpy is not None:
+        weights = numpy.array(weights, dtype=float)
+        values = numpy.asarray(values)
+        # mid-rank percentile, so tied hands share one
+        order = numpy.sort(values)
+        percentile = (numpy.searchsorted(order, values, 'left') + numpy.searchsorted(order, values, 'right')) / (2. * len(values))
+        weights[free] *= floor + slope * percentile ** power
+        return weights
+    weights = list(weights)
+    order = sorted(values)
+    for i, value in zip(free, values):
+        percentile = (bisect_left(order, value) + bisect_right(order, value)) / (2. * len(values))
+        weights[i] *= floor + slope * percentile ** power
+    return weights
+
+
+def range_table_sums(my_cards, board, weights):
+    '''
+    Returns the weighted wins (ties count half) and the total weight of the pairs of a
+    range on a final board.
+    '''
+    values = board_table(board)[0]
+    my_value = hand_eval.evaluate(my_cards + board)
+    if numpy is not None:
+        values = numpy.frombuffer(values, dtype=numpy.int32)
+        live = numpy.array(weights, dtype=float)
+        live[values < 0] = 0.
+        live[blocked(my_cards)] = 0.
+        return float(live[values < my_value].sum() + 0.5 * live[values == my_value].sum()), float(live.sum())
+    mine = set(blocked(my_cards))
+    wins = total = 0.
+    for i, (weight, value) in enumerate(zip(weights, values)):
+        if value >= 0 and i not in mine:
+            total += weight
+            wins += weight if value < my_value else (0.5 * weight if value == my_value else 0.)
+    return wins, total
+
+
+def live_range(my_cards, board, weights):
+    '''
+    Returns the probability of each pair in PAIRS under a range once my_cards and board are
+    seen: pairs holding one of them get none. A range with no live weight counts as uniform.
+    '''
+    dead = blocked(my_cards + board)
+    if numpy is not None:
+        probabilities = numpy.array(weights, dtype=float)
+        probabilities[dead] = 0.
+        if probabilities.sum() <= 0.:
+            probabilities = uniform_range()
+            probabilities[dead] = 0.
+        return probabilities / probabilities.sum()
+    probabilities = list(weights)
+    for i in dead:
+        probabilities[i] = 0.
+    if sum(probabilities) <= 0.:
+        probabilities = uniform_range()
+        for i in dead:
+            probabilities[i] = 0.
+    total = sum(probabilities)
+    return [probability / total for probability in probabilities]
+
+
+def cumulative(probabilities):
+    '''
+    Returns the running totals of live_range probabilities, which range_outcomes draws from.
+    '''
+    if numpy is not None:
+        return numpy.cumsum(probabilities)
+    totals = []
+    total = 0.
+    for probability in probabilities:
+        total += probability
+        totals.append(total)
+    return totals
+
+
+def range_outcomes(my_cards, board, totals, iters, rng=None):
+    '''
+    Plays iters runouts against opponent pairs drawn from a range, given as the cumulative
+    totals of its live_range probabilities, and returns the result of each, as outcomes
+    does. A pair and a runout are drawn independently and redrawn when they share a card;
+    every live pair meets the same number of runouts, so this is the same as drawing the
+    runout given the pair.
+    '''
+    deck = unseen(my_cards + board)
+    need_board = max(0, FINAL_BOARD_CARDS - len(board))
+    rng = rng if rng is not None else _rng
+    if numpy is None:
+        results = []
+        while len(results) < iters:
+            opp_cards = list(PAIRS[rng.choices(range(len(PAIRS)), cum_weights=totals)[0]])
+            runout = rng.sample(deck, need_board)
+            if opp_cards[0] in runout or opp_cards[1] in runout:
+                continue
+            my_value = hand_eval.evaluate(my_cards + board + runout)
+            opp_value = hand_eval.evaluate(opp_cards + board + runout)
+            results.append(1.0 if my_value > opp_value else (0.5 if my_value == opp_value else 0.))
+        return results
+    opp_pairs = numpy.empty((0, 2), dtype=numpy.intp)
+    runouts = numpy.empty((0, need_board), dtype=numpy.intp)
+    while len(opp_pairs) < iters:
+        # draw more than is missing so that one pass nearly always covers the clashes
+        size = iters - len(opp_pairs)
+        size += size // 4 + 8
+        # inverse transform sampling; the running totals may end a rounding error short of 1
+        pairs = PAIR_ARRAY[numpy.minimum(numpy.searchsorted(totals, rng.random(size) * totals[-1], 'right'),
+                                         len(PAIRS) - 1)]
+        drawn = draw(deck, need_board, size, rng)
+        clash = ((drawn == pairs[:, :1]) | (drawn == pairs[:, 1:])).any(axis=1)
+        opp_pairs = numpy.concatenate([opp_pairs, pairs[~clash]])
+        runouts = numpy.concatenate([runouts, drawn[~clash]])
+    opp_pairs, runouts = opp_pairs[:iters], runouts[:iters]
+    full_board = numpy.concatenate([numpy.broadcast_to(numpy.asarray(board, dtype=numpy.intp), (iters, len(board))),
+                                    runouts], axis=1)
+    my_values = hand_eval.evaluate_many(numpy.concatenate(
+        [numpy.broadcast_to(numpy.asarray(my_cards, dtype=numpy.intp), (iters, 2)), full_board], axis=1))
+    opp_values = hand_eval.evaluate_many(numpy.concatenate([opp_pairs, full_board], axis=1))
+    return (my_values > opp_values) + 0.5 * (my_values == opp_values)
+
+
+def range_equity(my_hole2, board, weights, iters=500, rng=None):
+    '''
+    Returns the equity of my_hole2 on board against an opponent range and its standard
+    error. Like strength, enumerates exactly (weighting every pair) when that costs no more
+    than iters runouts, and otherwise samples pairs in proportion to their weights. A range
+    with no live pair is treated as uniform.
+    '''
+    my_cards = hand_eval.encode(my_hole2)
+    board = hand_eval.encode(board)
+    probabilities = live_range(my_cards, board, weights)
+    if exact_cost(my_cards, board) <= SAMPLE_COST * iters:
+        need_board = FINAL_BOARD_CARDS - len(board)
+        wins = total = 0.
+        # every (pair, runout) combination weighs its pair's weight
+        for runout in combinations(unseen(my_cards + board), max(0, need_board)):
+            runout_wins, runout_total = range_table_sums(my_cards, board + list(runout), probabilities)
+            wins += runout_wins
+            total += runout_total
+        return wins / total, 0.
+    return summarize(range_outcomes(my_cards, board, cumulative(probabilities), iters, rng))
@@ -0,0 +1,155 @@
+'''
+Pre-forked worker processes that split one large equity query between them.
+
+A bot starts the pool once, before its first round, so no query pays for starting
+processes. Each worker is forked with the evaluator tables already mapped, draws from its
+own random stream and answers with the sums of its share of the runouts (equity.WORK),
+which add up exactly. The bot's own process runs a share too, then merges whatever the
+workers returned by the query's deadline; a late worker's answer is dropped and the
+worker is skipped until it is idle again.
+
+Queries below min_split runouts are not worth the round trip and stay in process, as
+does everything when the pool could not be started.
+'''
+import multiprocessing
+import os
+import random
+import time
+import equity
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MIN_SPLIT = 1000  # smallest query, in runouts, split across the workers (a round trip is ~0.1ms)
+MAX_WORKERS = 3  # workers start() uses by default, leaving cores for the engine and the opponent
+REPLY_TIMEOUT = 5.0  # longest wait for the workers of a query without a deadline, in seconds
+
+
+def serve(connection, seed):
+    '''
+    Answers (query id, kind, args, runouts) requests with (query id, sums) until the bot
+    closes the connection or sends None.
+    '''
+    rng = numpy.random.default_rng(seed) if numpy is not None else random.Random(seed)
+    while True:
+        try:
+            request = connection.recv()
+        except (EOFError, OSError):
+            return
+        if request is None:
+            return
+        query_id, kind, args, iters = request
+        try:
+            sums = equity.WORK[kind](*args, iters, rng)
+        except Exception:
+            sums = None
+        connection.send((query_id, sums))
+
+
+class EquityPool():
+    '''
+    A fixed set of forked workers and the connections to them.
+    '''
+
+    def __init__(self, workers, min_split=MIN_SPLIT, seed=None):
+        context = multiprocessing.get_context('fork')
+        if numpy is not None:
+            seeds = numpy.random.SeedSequence(seed).spawn(workers)
+        else:
+            seeds = [random.Random(seed).getrandbits(64) + i for i in range(workers)]
+        self.min_split = min_split
+        self.connections = []
+        self.processes = []
+        for worker_seed in seeds:
+            connection, worker_connection = context.Pipe()
+            process = context.Process(target=serve, args=(worker_connection, worker_seed), daemon=True)
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+        self.busy = [False] * workers
+        self.query_id = 0
+
+    def collect(self, worker, timeout):
+        '''
+        Waits up to timeout for one worker's answer and returns it, or None. Drops workers
+        whose process has gone away.
+        '''
+        connection = self.connections[worker]
+        try:
+            if connection is None or not connection.poll(max(0., timeout)):
+                return None
+            reply = connection.recv()
+        except (EOFError, OSError):
+            self.connections[worker] = None
+            return None
+        self.busy[worker] = False
+        return reply
+
+    def run(self, kind, args, iters, deadline=None):
+        '''
+        Splits a WORK query of iters runouts between the idle workers and this process and
+        returns the sums of every share answered by the time.perf_counter() deadline.
+        '''
+        self.query_id += 1
+        for worker in range(len(self.connections)):
+            if self.busy[worker]:
+                self.collect(worker, 0.)  # a late answer to an earlier query
+        idle = [worker for worker in range(len(self.connections))
+                if self.connections[worker] is not None and not self.busy[worker]]
+        share = iters // (len(idle) + 1)
+        sent = []
+        for worker in idle:
+            try:
+                self.connections[worker].send((self.query_id, kind, args, share))
+            except OSError:
+                self.connections[worker] = None
+                continue
+            self.busy[worker] = True
+            sent.append(worker)
+        total = equity.WORK[kind](*args, iters - share * len(sent), None)
+        wait_until = deadline if deadline is not None else time.perf_counter() + REPLY_TIMEOUT
+        for worker in sent:
+            reply = self.collect(worker, wait_until - time.perf_counter())
+            if reply is not None and reply[0] == self.query_id and reply[1] is not None:
+                for sums, worker_sums in zip(total, reply[1]):
+                    equity.add_sums(sums, worker_sums)
+        return total
+
+    def close(self):
+        '''
+        Stops the workers.
+        '''
+        for connection in self.connections:
+            if connection is not None:
+                try:
+                    connection.send(None)
+                    connection.close()
+                except OSError:
+                    pass
+        for process in self.processes:
+            process.join(1.)
+        self.connections = []
+        if equity.pool is self:
+            equity.pool = None
+
+
+def start(workers=None, min_split=MIN_SPLIT):
+    '''
+    Starts a pool of workers, MAX_WORKERS or one per spare CPU by default, and makes
+    equity split large queries across it. Returns the pool, the one already running, or
+    None (everything then stays in process) if there are no spare CPUs or the platform
+    cannot fork.
+    '''
+    if equity.pool is not None:
+        return equity.pool
+    if workers is None:
+        workers = min(MAX_WORKERS, (os.cpu_count() or 1) - 1)
+    if workers < 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    try:
+        equity.pool = EquityPool(workers, min_split)
+    except (OSError, ValueError):
+        return None
+    return equity.pool
@@ -0,0 +1,242 @@
+'''
+Table-driven evaluator for 5 to 8 card poker hands.
+
+Cards are the integers 0-51 the bots already use: suit * 13 + rank, with ranks 0-12 for
+2 to A and suits 0-3 for c, d, h, s. A hand's value is exactly what pkrbot.evaluate returns
+for it, so values from both can be compared freely.
+
+The value of a hand is the larger of two table lookups:
+- the rank table, indexed by the multiset of its ranks (the combinatorial number system
+  over the sorted ranks), holds the best hand that ignores suits;
+- the flush table, indexed by the 13-bit rank mask of a suit holding five or more cards,
+  holds the best flush or straight flush. Eight cards never hold two such suits.
+
+The tables are generated once from pkrbot.evaluate into hand_eval.tables next to this file
+and memory-mapped by every process that imports the module. evaluate_many scores a whole
+batch of hands in one call, vectorized with numpy when it is installed.
+
+Run this file to check the tables against pkrbot.evaluate.
+'''
+from array import array
+from itertools import combinations, combinations_with_replacement
+from math import comb
+import mmap
+import os
+import random
+import sys
+import tempfile
+import pkrbot
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TABLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hand_eval.tables')
+TABLES_MAGIC = b'HEVAL01\n'
+RANK_CHARS = '23456789TJQKA'
+SUIT_CHARS = 'cdhs'
+MIN_CARDS = 5
+MAX_CARDS = 8
+
+RANK_OF = [card % 13 for card in range(52)]
+# one 4-bit counter per suit: adding 3 to a counter sets its top bit once it reaches 5
+SUIT_COUNT = [1 << 4 * (card // 13) for card in range(52)]
+# COLEX[i][rank] is the contribution of the i-th smallest rank to the index of a rank multiset
+COLEX = [[comb(rank + i, i + 1) for rank in range(13)] for i in range(MAX_CARDS)]
+# the flush table comes first, then one rank table per hand size
+RANK_OFFSETS = {}
+TABLE_SIZE = 1 << 13
+for _num_cards in range(MIN_CARDS, MAX_CARDS + 1):
+    RANK_OFFSETS[_num_cards] = TABLE_SIZE
+    TABLE_SIZE += comb(13 + _num_cards - 1, _num_cards)
+del _num_cards
+
+
+def to_card(card):
+    '''
+    Returns the pkrbot Card of a card integer.
+    '''
+    return pkrbot.Card(RANK_CHARS[card % 13] + SUIT_CHARS[card // 13])
+
+
+def encode(cards):
+    '''
+    Returns the card integers of a list of card integers, pkrbot Cards or strings like "Ah".
+    '''
+    result = []
+    for card in cards:
+        if isinstance(card, int):
+            result.append(card)
+        elif isinstance(card, str):
+            result.append(SUIT_CHARS.index(card[1].lower()) * 13 + RANK_CHARS.index(card[0].upper()))
+        else:
+            result.append(card.suit * 13 + card.rank)
+    return result
+
+
+def build_tables():
+    '''
+    Evaluates one representative hand per table entry with pkrbot and returns the table.
+    '''
+    table = array('I', bytes(4 * TABLE_SIZE))
+    for mask in range(1 << 13):
+        ranks = [rank for rank in range(13) if mask >> rank & 1]
+        if MIN_CARDS <= len(ranks) <= MAX_CARDS:
+            table[mask] = pkrbot.evaluate([to_card(3 * 13 + rank) for rank in ranks])
+    for num_cards in range(MIN_CARDS, MAX_CARDS + 1):
+        for ranks in combinations_with_replacement(range(13), num_cards):
+            if any(ranks.count(rank) > 4 for rank in set(ranks)):
+                continue
+            # cycling the suits puts at most two cards in a suit and never repeats a card
+            cards = [(i % 4) * 13 + rank for i, rank in enumerate(ranks)]
+            table[rank_index(ranks)] = pkrbot.evaluate([to_card(card) for card in cards])
+    return table
+
+
+def load_tables():
+    '''
+    Memory-maps the tables, generating the file first if it is missing or stale.
+    '''
+    expected_size = len(TABLES_MAGIC) + 4 * TABLE_SIZE
+    if not os.path.exists(TABLES_PATH) or os.path.getsize(TABLES_PATH) != expected_size:
+        table = build_tables()
+        if sys.byteorder != 'little':
+            table.byteswap()
+        # write to a temporary file first so concurrent processes never map a partial table
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(TABLES_PATH))
+        with os.fdopen(handle, 'wb') as table_file:
+            table_file.write(TABLES_MAGIC)
+            table_file.write(table.tobytes())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, TABLES_PATH)
+    with open(TABLES_PATH, 'rb') as table_file:
+        mapped = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(TABLES_MAGIC)] != TABLES_MAGIC:
+        raise ValueError(TABLES_PATH + ' is not a hand_eval table file')
+    if sys.byteorder != 'little':
+        table = array('I', mapped[len(TABLES_MAGIC):])
+        table.byteswap()
+        return mapped, table
+    return mapped, memoryview(mapped)[len(TABLES_MAGIC):].cast('I')
+
+
+def rank_index(ranks):
+    '''
+    Returns the rank table entry of a sorted multiset of ranks.
+    '''
+    index = RANK_OFFSETS[len(ranks)]
+    for colex, rank in zip(COLEX, ranks):
+        index += colex[rank]
+    return index
+
+
+_MAPPED, TABLE = load_tables()
+if numpy is not None:
+    TABLE_ARRAY = numpy.frombuffer(_MAPPED, dtype='<u4', offset=len(TABLES_MAGIC))
+    COLEX_ARRAY = numpy.array(COLEX, dtype=numpy.intp)
+
+
+def evaluate(cards):
+    '''
+    Returns the value of the best five card hand among 5 to 8 card integers.
+    '''
+    value = TABLE[rank_index(sorted(map(RANK_OF.__getitem__, cards)))]
+    flush = (sum(map(SUIT_COUNT.__getitem__, cards)) + 0x3333) & 0x8888
+    if flush:
+        suit = flush.bit_length() // 4 - 1
+        mask = 0
+        for card in cards:
+            if card // 13 == suit:
+                mask |= 1 << card % 13
+        flush_value = TABLE[mask]
+        return flush_value if flush_value > value else value
+    return value
+
+
+def evaluate_many(hands):
+    '''
+    Returns the values of many hands of the same size.
+
+    hands is a list of card integer lists or a 2D numpy array with one hand per row. With
+    numpy the result is a numpy array and the whole batch is scored with array operations;
+    without it, a list.
+    '''
+    if numpy is None:
+        return [evaluate(cards) for cards in hands]
+    cards = numpy.asarray(hands, dtype=numpy.intp)
+    if cards.ndim != 2 or len(cards) == 0:
+        return numpy.zeros(len(cards), dtype=numpy.uint32)
+    num_cards = cards.shape[1]
+    ranks = cards % 13
+    index = COLEX_ARRAY[numpy.arange(num_cards), numpy.sort(ranks, axis=1)].sum(axis=1)
+    values = TABLE_ARRAY[index + RANK_OFFSETS[num_cards]]
+    suits = cards // 13
+    bits = numpy.left_shift(1, ranks)
+    for suit in range(4):
+        in_suit = suits == suit
+        flushes = numpy.flatnonzero(in_suit.sum(axis=1) >= 5)
+        if len(flushes) > 0:
+            # the ranks of one suit are distinct, so summing their bits ors them
+            masks = numpy.where(in_suit[flushes], bits[flushes], 0).sum(axis=1)
+            values[flushes] = numpy.maximum(values[flushes], TABLE_ARRAY[masks])
+    return values
+
+
+def count_wins(hands, opponent_hands):
+    '''
+    Returns how many of the hands beat the opponent hand in the same position, counting ties as half.
+    '''
+    values = evaluate_many(hands)
+    opponent_values = evaluate_many(opponent_hands)
+    if numpy is None:
+        return sum(1.0 if value > opponent_value else (0.5 if value == opponent_value else 0.)
+                   for value, opponent_value in zip(values, opponent_values))
+    return float(numpy.count_nonzero(values > opponent_values)) + 0.5 * numpy.count_nonzero(values == opponent_values)
+
+
+def check(samples=200000):
+    '''
+    Compares the evaluator with pkrbot.evaluate on every 5 card hand and on random 6 to 8
+    card hands, and prints how many hands of each class were checked. Returns the number of
+    mismatches.
+    '''
+    cards = [to_card(card) for card in range(52)]
+    mismatches = 0
+    hands = {5: combinations(range(52), 5)}
+    for num_cards in range(6, MAX_CARDS + 1):
+        hands[num_cards] = (random.sample(range(52), num_cards) for _ in range(samples))
+    for num_cards, hand_iter in hands.items():
+        classes = {}
+        batch = []
+        for hand in hand_iter:
+            batch.append(hand)
+            if len(batch) == 65536:
+                mismatches += check_batch(batch, cards, classes)
+                batch = []
+        if batch:
+            mismatches += check_batch(batch, cards, classes)
+        print('{} cards: {}'.format(num_cards, ', '.join(
+            ['{} {}'.format(name, count) for name, count in sorted(classes.items(), key=lambda item: item[1])])))
+    print('{} mismatches'.format(mismatches))
+    return mismatches
+
+
+def check_batch(batch, cards, classes):
+    '''
+    Checks one batch of hands with both evaluate_many and evaluate, tallying hand classes.
+    '''
+    mismatches = 0
+    values = evaluate_many(batch)
+    for i, hand in enumerate(batch):
+        expected = pkrbot.evaluate([cards[card] for card in hand])
+        name = pkrbot.handtype(expected)
+        classes[name] = classes.get(name, 0) + 1
+        if values[i] != expected or (i % 64 == 0 and evaluate(hand) != expected):
+            mismatches += 1
+            if mismatches <= 10:
+                print('mismatch:', [str(cards[card]) for card in hand], values[i], evaluate(hand), expected)
+    return mismatches
+
+
+if __name__ == '__main__':
+    sys.exit(1 if check() > 0 else 0)
@@ -0,0 +1,128 @@
+'''
+Structured hand history written by the engine next to the game log.
+
+<name>.hands.jsonl holds one compact JSON record per round:
+    {"round": 12, "seed": ..., "players": [seat 0 name, seat 1 name],
+     "hands": [[...], [...]], "board": [...],
+     "actions": [[seat, "R20", latency, compute], ...], "deltas": [seat 0, seat 1]}
+
+latency is the wall time of the query in seconds and compute the bot's self-reported
+compute time for it, or null if the bot did not report one.
+
+<name>.hands.idx is an append-only table of fixed-width little-endian rows
+(byte offset of the record, round number, PLAYER_1 delta, PLAYER_2 delta), so a tool
+can seek straight to round N or map the deltas column without reading the records,
+e.g. numpy.memmap(path, dtype=[('offset', '<u8'), ('round', '<i4'), ('delta1', '<i4'), ('delta2', '<i4')]).
+'''
+from bisect import bisect_left
+import json
+import mmap
+import os
+import struct
+
+INDEX_RECORD = struct.Struct('<Qiii')
+
+
+class HandHistoryWriter():
+    '''
+    Appends round records and their index rows.
+    '''
+
+    def __init__(self, name, mode='w'):
+        self.name = name + '.hands.jsonl'
+        self.index_name = name + '.hands.idx'
+        self.file = open(self.name, mode + 'b')
+        self.index_file = open(self.index_name, mode + 'b')
+        self.offset = self.file.seek(0, os.SEEK_END)
+
+    def write(self, record, deltas):
+        '''
+        Appends one round. deltas are the PLAYER_1 and PLAYER_2 bankroll changes.
+        '''
+        line = json.dumps(record, separators=(',', ':')).encode() + b'\n'
+        self.index_file.write(INDEX_RECORD.pack(self.offset, record['round'], deltas[0], deltas[1]))
+        self.file.write(line)
+        self.offset += len(line)
+
+    def flush(self):
+        self.file.flush()
+        self.index_file.flush()
+
+    def checkpoint(self):
+        '''
+        Writes out every round so far and returns the sizes of the record and index files.
+        '''
+        self.flush()
+        return [self.offset, self.index_file.tell()]
+
+    def close(self):
+        self.file.close()
+        self.index_file.close()
+
+
+class HandHistory():
+    '''
+    Random access to a hand history through its index.
+    '''
+
+    def __init__(self, name):
+        self.name = name + '.hands.jsonl'
+        with open(name + '.hands.idx', 'rb') as index_file:
+            size = os.fstat(index_file.fileno()).st_size
+            self.index = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b''
+        self.rounds = [row[1] for row in INDEX_RECORD.iter_unpack(self.index)]
+
+    def __len__(self):
+        return len(self.rounds)
+
+    def row(self, round_num):
+        '''
+        Returns the index row (offset, round, PLAYER_1 delta, PLAYER_2 delta) of a round.
+        '''
+        position = bisect_left(self.rounds, round_num)
+        if position == len(self.rounds) or self.rounds[position] != round_num:
+            raise KeyError(round_num)
+        return INDEX_RECORD.unpack_from(self.index, position * INDEX_RECORD.size)
+
+    def read(self, round_num):
+        '''
+        Seeks to and decodes the record of one round.
+        '''
+        offset = self.row(round_num)[0]
+        with open(self.name, 'rb') as history_file:
+            history_file.seek(offset)
+            return json.loads(history_file.readline())
+
+    def deltas(self):
+        '''
+        Returns the (PLAYER_1, PLAYER_2) deltas of every round straight from the index.
+        '''
+        return [(delta1, delta2) for _, _, delta1, delta2 in INDEX_RECORD.iter_unpack(self.index)]
+
+
+def truncate(name, offset, index_offset):
+    '''
+    Cuts a hand history back to the sizes recorded by HandHistoryWriter.checkpoint.
+    '''
+    os.truncate(name + '.hands.jsonl', offset)
+    os.truncate(name + '.hands.idx', index_offset)
+
+
+def merge(names, name):
+    '''
+    Concatenates the hand histories of consecutive match shards into one and removes them.
+    '''
+    with open(name + '.hands.jsonl', 'wb') as history_file, open(name + '.hands.idx', 'wb') as index_file:
+        base = 0
+        for shard_name in names:
+            with open(shard_name + '.hands.idx', 'rb') as shard_index:
+                for offset, round_num, delta1, delta2 in INDEX_RECORD.iter_unpack(shard_index.read()):
+                    index_file.write(INDEX_RECORD.pack(base + offset, round_num, delta1, delta2))
+            with open(shard_name + '.hands.jsonl', 'rb') as shard_file:
+                while True:
+                    chunk = shard_file.read(1 << 20)
+                    if not chunk:
+                        break
+                    base += history_file.write(chunk)
+            os.remove(shard_name + '.hands.idx')
+            os.remove(shard_name + '.hands.jsonl')
@@ -0,0 +1,129 @@
+'''
+Suit-isomorphic canonical forms of poker states, shared by caches and tables.
+
+A state is a list of card groups, e.g. [hole cards, board] or [hole cards, board, my
+discard, opponent discard]; the order of cards within a group does not matter, the order
+of the groups does. Relabeling the suits never changes how a state plays, so every state is
+mapped to one canonical representative of its class and to an integer naming that class.
+
+The signature of a suit is the rank bitmask of its cards in each group, packed 13 bits per
+group with the first group highest. A class is exactly the multiset of its 4 suit
+signatures, so the canonical relabeling gives suit 0 the largest signature, suit 1 the next
+one and so on (suits with equal signatures are interchangeable), and the index of a state
+packs the 4 sorted signatures into one integer. unindex turns an index back into the
+canonical groups. The *_many functions do the same for whole batches with numpy.
+
+Cards are card integers (suit * 13 + rank); pass others through hand_eval.encode first.
+'''
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+RANK_BITS = 13
+
+
+def signatures(groups):
+    '''
+    Returns the signature of each of the 4 suits in a state.
+    '''
+    result = [0, 0, 0, 0]
+    shift = RANK_BITS * len(groups)
+    for group in groups:
+        shift -= RANK_BITS
+        for card in group:
+            result[card // 13] |= 1 << (shift + card % 13)
+    return result
+
+
+def suit_map(groups):
+    '''
+    Returns the canonical suit of each suit in a state: suit_map(groups)[suit].
+    '''
+    suit_signatures = signatures(groups)
+    order = sorted(range(4), key=suit_signatures.__getitem__, reverse=True)
+    relabel = [0, 0, 0, 0]
+    for canonical_suit, suit in enumerate(order):
+        relabel[suit] = canonical_suit
+    return relabel
+
+
+def canonicalize(groups):
+    '''
+    Returns the canonical representative of a state, each group sorted.
+    '''
+    relabel = suit_map(groups)
+    return [sorted(relabel[card // 13] * 13 + card % 13 for card in group) for group in groups]
+
+
+def index(groups):
+    '''
+    Returns the integer naming the class of a state; states share it iff they are isomorphic.
+    '''
+    width = RANK_BITS * len(groups)
+    result = 0
+    for signature in sorted(signatures(groups), reverse=True):
+        result = result << width | signature
+    return result
+
+
+def unindex(class_index, num_groups):
+    '''
+    Returns the canonical representative of the class index names, for num_groups groups.
+    '''
+    width = RANK_BITS * num_groups
+    groups = [[] for _ in range(num_groups)]
+    for suit in range(4):
+        signature = class_index >> width * (3 - suit) & ((1 << width) - 1)
+        for group in range(num_groups):
+            mask = signature >> RANK_BITS * (num_groups - 1 - group)
+            groups[group].extend(suit * 13 + rank for rank in range(13) if mask >> rank & 1)
+    return [sorted(group) for group in groups]
+
+
+def signatures_many(groups):
+    '''
+    Returns the suit signatures of a batch of states as an (n, 4) uint64 array.
+
+    groups is a list of 2D card integer arrays, one row per state, with the same number of
+    states in each; at most 4 groups fit in 64 bits.
+    '''
+    groups = [numpy.asarray(group, dtype=numpy.int64) for group in groups]
+    if RANK_BITS * len(groups) > 64:
+        raise ValueError('at most 4 groups fit in a batch signature')
+    result = numpy.zeros((len(groups[0]), 4), dtype=numpy.uint64)
+    rows = numpy.arange(len(groups[0]))
+    shift = RANK_BITS * len(groups)
+    for group in groups:
+        shift -= RANK_BITS
+        bits = numpy.left_shift(numpy.uint64(1), (shift + group % 13).astype(numpy.uint64))
+        for column in range(group.shape[1]):
+            # the cards of a group are distinct, so or-ing is the same as adding
+            numpy.bitwise_or.at(result, (rows, group[:, column] // 13), bits[:, column])
+    return result
+
+
+def canonicalize_many(groups):
+    '''
+    Returns the canonical representatives of a batch of states, one sorted array per group.
+    '''
+    groups = [numpy.asarray(group, dtype=numpy.int64) for group in groups]
+    order = numpy.argsort(signatures_many(groups), axis=1)[:, ::-1]
+    relabel = numpy.empty_like(order)
+    numpy.put_along_axis(relabel, order, numpy.arange(4)[None, :].repeat(len(order), axis=0), axis=1)
+    result = []
+    for group in groups:
+        suits = numpy.take_along_axis(relabel, group // 13, axis=1)
+        result.append(numpy.sort(suits * 13 + group % 13, axis=1))
+    return result
+
+
+def index_many(groups):
+    '''
+    Returns the class indices of a batch of states as a list of integers.
+    '''
+    width = RANK_BITS * len(groups)
+    result = []
+    for row in numpy.sort(signatures_many(groups), axis=1)[:, ::-1].tolist():
+        result.append(row[0] << 3 * width | row[1] << 2 * width | row[2] << width | row[3])
+    return result
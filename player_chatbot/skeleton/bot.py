@@ -8,6 +8,33 @@ class Bot():
     The base class for a pokerbot.
     '''
 
+    def handle_new_match(self):
+        '''
+        Called when the engine reuses this bot for another match. Not called for the first match.
+
+        Reset anything that should not carry over from one match to the next here. Only bots
+        with "persistent": true in commands.json are reused.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Nothing.
+        '''
+        pass
+
+    def handle_match_over(self):
+        '''
+        Called when a match ends, before the bot quits or is reused for the next match.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Nothing.
+        '''
+        pass
+
     def handle_new_round(self, game_state, round_state, active):
         '''
         Called when a new round starts. Called NUM_ROUNDS times.
@@ -3,6 +3,7 @@ The infrastructure for interacting with the engine.
 '''
 import argparse
 import socket
+import time
 from .actions import FoldAction, CallAction, CheckAction, RaiseAction, DiscardAction
 from .states import GameState, TerminalState, RoundState
 from .states import STARTING_STACK, BIG_BLIND, SMALL_BLIND
@@ -17,6 +18,10 @@ class Runner():
     def __init__(self, pokerbot, socketfile):
         self.pokerbot = pokerbot
         self.socketfile = socketfile
+        self.game_state = GameState(0, 0., 1)
+        self.round_state = None
+        self.active = 0
+        self.round_flag = True
 
     def receive(self):
         '''
@@ -28,9 +33,9 @@ class Runner():
                 break
             yield packet
 
-    def send(self, action):
+    def send(self, action, compute_time=None):
         '''
-        Encodes an action and sends it to the engine.
+        Encodes an action and sends it to the engine, with the seconds spent computing it if given.
         '''
         if isinstance(action, FoldAction):
             code = 'F'
@@ -42,6 +47,8 @@ class Runner():
             code = 'D' + str(action.card)## action.card is the index of the action card in the player's hand
         else:  # isinstance(action, RaiseAction)
             code = 'R' + str(action.amount)
+        if compute_time is not None:
+            code += ' t{:.6f}'.format(compute_time)
         self.socketfile.write(code + '\n')
         self.socketfile.flush()
 
@@ -49,76 +56,93 @@ class Runner():
         '''
         Reconstructs the game tree based on the action history received from the engine.
         '''
-        game_state = GameState(0, 0., 1)
-        round_state = None
-        active = 0
-        round_flag = True
         for packet in self.receive():
-            for clause in packet:
-                if clause[0] == 'T':
-                    game_state = GameState(game_state.bankroll, float(clause[1:]), game_state.round_num)
-                elif clause[0] == 'P':
-                    active = int(float(clause[1:]))
-                elif clause[0] == 'H':
-                    hands = [[], []]
+            start_time = time.perf_counter()
+            action = self.handle_packet(packet)
+            if action is None:
+                return
+            self.send(action, time.perf_counter() - start_time)
 
-                    hands[active] = clause[1:].split(',')
-                    pips = [SMALL_BLIND, BIG_BLIND]
-                    stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
-                    round_state = RoundState(0, 0, pips, stacks, hands, [], None)
-                elif clause[0] == 'G':
-                    # 'G' clause indicates game/round start - just update the round_state without changing values
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             round_state.hands, round_state.board, round_state.previous_state)
-                    if round_flag:
-                        self.pokerbot.handle_new_round(game_state, round_state, active)
-                        round_flag = False
-                elif clause[0] == 'F':
-                    round_state = round_state.proceed(FoldAction())
-                elif clause[0] == 'C':
-                    round_state = round_state.proceed(CallAction())
-                elif clause[0] == 'K':
-                    round_state = round_state.proceed(CheckAction())
-                elif clause[0] == 'D':
-                    if isinstance(round_state, RoundState):
-                        round_state = round_state.proceed(DiscardAction(int(clause[1:])))
-                    else:
-                        pass
-                elif clause[0] == 'R':
-                    round_state = round_state.proceed(RaiseAction(int(float(clause[1:]))))
-                elif clause[0] == 'B':
-                    # 'B' clause contains the board cards for the current street
-                    # The street should already be correct from previous proceed() calls
-                    # Just update the board with the cards from the engine
-                    board_cards = clause[1:].split(',') if len(clause) > 1 else []
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             round_state.hands, board_cards, round_state.previous_state)
-                elif clause[0] == 'O':
-                    # backtrack
-                    round_state = round_state.previous_state
-                    revised_hands = list(round_state.hands)
-                    revised_hands[1-active] = clause[1:].split(',')
-                    # rebuild history
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             revised_hands, round_state.board, round_state.previous_state)
-                    round_state = TerminalState([0, 0], round_state)
-                elif clause[0] == 'A':
-                    assert isinstance(round_state, TerminalState)
-                    delta = int(float(clause[1:]))
-                    deltas = [-delta, -delta]
-                    deltas[active] = delta
-                    round_state = TerminalState(deltas, round_state.previous_state)
-                    self.pokerbot.handle_round_over(game_state, round_state, active)
-                    game_state = GameState(game_state.bankroll + delta, game_state.game_clock, game_state.round_num)
-                    round_flag = True
-                elif clause[0] == 'Q':
-                    return
-            if round_flag or isinstance(round_state, TerminalState):  # ack the engine
-                self.send(CheckAction())
-            else:
-                ##assert active == round_state.button % 2
-                action = self.pokerbot.get_action(game_state, round_state, active)
-                self.send(action)
+    def handle_packet(self, packet):
+        '''
+        Applies one message from the engine to the game tree and returns the response.
+
+        Returns the bot's action, CheckAction() as the end of round ack, or None once the
+        engine has sent Q. Used directly by the engine when it hosts the bot in-process.
+
+        With "coalesced_rounds" in commands.json the engine sends no ack request: the O and A
+        clauses of a round arrive at the start of the next message (or before Q), and are
+        applied before the new round's clauses in the same packet.
+        '''
+        for clause in packet:
+            if clause[0] == 'T':
+                self.game_state = GameState(self.game_state.bankroll, float(clause[1:]), self.game_state.round_num)
+            elif clause[0] == 'P':
+                self.active = int(float(clause[1:]))
+            elif clause[0] == 'H':
+                hands = [[], []]
+
+                hands[self.active] = clause[1:].split(',')
+                pips = [SMALL_BLIND, BIG_BLIND]
+                stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
+                self.round_state = RoundState(0, 0, pips, stacks, hands, [])
+            elif clause[0] == 'G':
+                # 'G' clause indicates game/round start - the round_state is left as it is
+                if self.round_flag:
+                    self.pokerbot.handle_new_round(self.game_state, self.round_state, self.active)
+                    self.round_flag = False
+            elif clause[0] == 'F':
+                self.round_state = self.round_state.proceed(FoldAction())
+            elif clause[0] == 'C':
+                self.round_state = self.round_state.proceed(CallAction())
+            elif clause[0] == 'K':
+                self.round_state = self.round_state.proceed(CheckAction())
+            elif clause[0] == 'D':
+                if isinstance(self.round_state, RoundState):
+                    self.round_state = self.round_state.proceed(DiscardAction(int(clause[1:])))
+                else:
+                    pass
+            elif clause[0] == 'R':
+                self.round_state = self.round_state.proceed(RaiseAction(int(float(clause[1:]))))
+            elif clause[0] == 'B':
+                # 'B' clause contains the board cards for the current street
+                # The street should already be correct from previous proceed() calls
+                # Just update the board with the cards from the engine
+                board_cards = clause[1:].split(',') if len(clause) > 1 else []
+                self.round_state = RoundState(self.round_state.button, self.round_state.street, self.round_state.pips, self.round_state.stacks,
+                                              self.round_state.hands, board_cards)
+            elif clause[0] == 'O':
+                # backtrack to the snapshot the terminal state keeps of the last round state
+                self.round_state = self.round_state.previous_state
+                revised_hands = list(self.round_state.hands)
+                revised_hands[1-self.active] = clause[1:].split(',')
+                # rebuild history
+                self.round_state = RoundState(self.round_state.button, self.round_state.street, self.round_state.pips, self.round_state.stacks,
+                                              revised_hands, self.round_state.board)
+                self.round_state = TerminalState([0, 0], self.round_state)
+            elif clause[0] == 'A':
+                assert isinstance(self.round_state, TerminalState)
+                delta = int(float(clause[1:]))
+                deltas = [-delta, -delta]
+                deltas[self.active] = delta
+                self.round_state = TerminalState(deltas, self.round_state.previous_state)
+                self.pokerbot.handle_round_over(self.game_state, self.round_state, self.active)
+                self.game_state = GameState(self.game_state.bankroll + delta, self.game_state.game_clock, self.game_state.round_num)
+                self.round_flag = True
+            elif clause[0] == 'N':
+                # a new match starts on this connection - forget the last one
+                self.pokerbot.handle_match_over()
+                self.game_state = GameState(0, 0., 1)
+                self.round_state = None
+                self.round_flag = True
+                self.pokerbot.handle_new_match()
+            elif clause[0] == 'Q':
+                self.pokerbot.handle_match_over()
+                return
+        if self.round_flag or isinstance(self.round_state, TerminalState):  # ack the engine
+            return CheckAction()
+        ##assert self.active == self.round_state.button % 2
+        return self.pokerbot.get_action(self.game_state, self.round_state, self.active)
 
 
 def parse_args():
@@ -127,7 +151,9 @@ def parse_args():
     '''
     parser = argparse.ArgumentParser(prog='python3 player.py')
     parser.add_argument('--host', type=str, default='localhost', help='Host to connect to, defaults to localhost')
-    parser.add_argument('port', type=int, help='Port on host to connect to')
+    parser.add_argument('--unix', type=str, default=None, help='Unix domain socket to connect to instead of a port')
+    parser.add_argument('--fd', type=int, default=None, help='Already connected socket inherited from the engine')
+    parser.add_argument('port', type=int, nargs='?', help='Port on host to connect to')
     return parser.parse_args()
 
 def run_bot(pokerbot, args):
@@ -136,11 +162,21 @@ def run_bot(pokerbot, args):
     '''
     assert isinstance(pokerbot, Bot)
     try:
-        sock = socket.create_connection((args.host, args.port))
+        if args.fd is not None:
+            sock = socket.socket(fileno=args.fd)
+        elif args.unix is not None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(args.unix)
+        else:
+            sock = socket.create_connection((args.host, args.port))
     except OSError:
-        print('Could not connect to {}:{}'.format(args.host, args.port))
+        print('Could not connect to {}'.format(args.unix or args.fd or '{}:{}'.format(args.host, args.port)))
         return
     socketfile = sock.makefile('rw')
+    if args.fd is not None:
+        # an inherited socket is connected before the bot has loaded, so tell the engine when it is ready
+        socketfile.write('K\n')
+        socketfile.flush()
     runner = Runner(pokerbot, socketfile)
     runner.run()
     socketfile.close()
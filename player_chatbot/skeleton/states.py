@@ -13,10 +13,37 @@ BIG_BLIND = 2
 SMALL_BLIND = 1
 
 
-class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks', 'hands', 'board', 'previous_state'])):
+# legal action sets are shared constants, so legal_actions() allocates nothing
+DISCARD_ACTIONS = frozenset([DiscardAction])
+CHECK_ACTIONS = frozenset([CheckAction])
+CHECK_FOLD_ACTIONS = frozenset([CheckAction, FoldAction])
+CHECK_RAISE_FOLD_ACTIONS = frozenset([CheckAction, RaiseAction, FoldAction])
+FOLD_CALL_ACTIONS = frozenset([FoldAction, CallAction])
+FOLD_CALL_RAISE_ACTIONS = frozenset([FoldAction, CallAction, RaiseAction])
+
+
+class RoundState():
     '''
     Encodes the game tree for one round of poker.
+
+    A compact state with fixed __slots__ fields and pips/stacks held as (player 0, player 1)
+    tuples. States do not link back to the states before them: the only history kept is
+    TerminalState.previous_state, the snapshot the Runner backtracks to at showdown.
     '''
+    __slots__ = ('button', 'street', 'pips', 'stacks', 'hands', 'board')
+
+    def __init__(self, button, street, pips, stacks, hands, board):
+        self.button = button
+        self.street = street
+        self.pips = tuple(pips)
+        self.stacks = tuple(stacks)
+        self.hands = hands
+        self.board = board
+
+    def __repr__(self):
+        return 'RoundState(button={}, street={}, pips={}, stacks={}, hands={}, board={})'.format(
+            self.button, self.street, self.pips, self.stacks, self.hands, self.board)
+
     def showdown(self):
         '''
         Compares the players' hands and computes payoffs.
@@ -30,15 +57,15 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         active = self.button % 2
         continue_cost = self.pips[1-active] - self.pips[active]
         if self.street in (2, 3):
-            return {DiscardAction} if active != self.street % 2 else {CheckAction}
+            return DISCARD_ACTIONS if active != self.street % 2 else CHECK_ACTIONS
         if continue_cost == 0:
             # we can only raise the stakes if both players can afford it
             bets_forbidden = (self.stacks[0] == 0 or self.stacks[1] == 0)
-            return {CheckAction, FoldAction} if bets_forbidden else {CheckAction, RaiseAction, FoldAction}
+            return CHECK_FOLD_ACTIONS if bets_forbidden else CHECK_RAISE_FOLD_ACTIONS
         # continue_cost > 0
         # similarly, re-raising is only allowed if both players can afford it
         raises_forbidden = (continue_cost == self.stacks[active] or self.stacks[1-active] == 0)
-        return {FoldAction, CallAction} if raises_forbidden else {FoldAction, CallAction, RaiseAction}
+        return FOLD_CALL_ACTIONS if raises_forbidden else FOLD_CALL_RAISE_ACTIONS
 
     def raise_bounds(self):
         '''
@@ -50,6 +77,15 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         min_contribution = min(max_contribution, continue_cost + max(continue_cost, BIG_BLIND))
         return (self.pips[active] + min_contribution, self.pips[active] + max_contribution)
 
+    def contribute(self, active, contribution):
+        '''
+        Returns the pips and stacks after the active player puts more chips in the pot.
+        '''
+        pips, stacks = self.pips, self.stacks
+        if active == 0:
+            return (pips[0] + contribution, pips[1]), (stacks[0] - contribution, stacks[1])
+        return (pips[0], pips[1] + contribution), (stacks[0], stacks[1] - contribution)
+
     def proceed_street(self):
         '''
         Resets the players' pips and advances the game tree to the next round of betting and updates the board state.
@@ -69,7 +105,7 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
             new_street = self.street + 1
             button = 1 ### Player B acts first after the discard phase
 
-        return RoundState(button, new_street, [0, 0], self.stacks, self.hands, self.board, self)
+        return RoundState(button, new_street, (0, 0), self.stacks, self.hands, self.board)
 
 
     def proceed(self, action):
@@ -101,31 +137,22 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         if isinstance(action, DiscardAction):
             if len(self.hands[active]) != 0:
                 self.board.append(self.hands[active].pop(action.card))
-            state = RoundState((1 - active) % 2, self.street, self.pips, self.stacks, self.hands, self.board, self)
-            return state
+            return RoundState((1 - active) % 2, self.street, self.pips, self.stacks, self.hands, self.board)
         if isinstance(action, FoldAction):
             delta = self.stacks[0] - STARTING_STACK if active == 0 else STARTING_STACK - self.stacks[1]
             return TerminalState([delta, -delta], self)
         if isinstance(action, CallAction):
             if self.button == 0:  # sb calls bb
-                return RoundState(1, 0, [BIG_BLIND] * 2, [STARTING_STACK - BIG_BLIND] * 2, self.hands, self.board,self)
+                return RoundState(1, 0, (BIG_BLIND, BIG_BLIND), (STARTING_STACK - BIG_BLIND, STARTING_STACK - BIG_BLIND), self.hands, self.board)
             # both players acted
-            new_pips = list(self.pips)
-            new_stacks = list(self.stacks)
-            contribution = new_pips[1-active] - new_pips[active]
-            new_stacks[active] -= contribution
-            new_pips[active] += contribution
-            state = RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.board, self)
+            new_pips, new_stacks = self.contribute(active, self.pips[1-active] - self.pips[active])
+            state = RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.board)
             return state.proceed_street()
         if isinstance(action, CheckAction):
             if (self.street == 0 and self.button > 0) or self.button > 1 or self.street == 2 or self.street == 3:  # both players acted
                 return self.proceed_street()
             # let opponent act
-            return RoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.board, self)
+            return RoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.board)
         # isinstance(action, RaiseAction)
-        new_pips = list(self.pips)
-        new_stacks = list(self.stacks)
-        contribution = action.amount - new_pips[active]
-        new_stacks[active] -= contribution
-        new_pips[active] += contribution
-        return RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.board, self)
\ No newline at end of file
+        new_pips, new_stacks = self.contribute(active, action.amount - self.pips[active])
+        return RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.board)
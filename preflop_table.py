@@ -0,0 +1,144 @@
+'''
+Preflop equity of every 3-card starting hand for each card it can discard.
+
+Each player is dealt 3 cards and discards one of them to the board on the flop, so a
+starting hand is worth the equity of the pair it keeps, with the discarded card among the
+6 board cards, against a random opponent pair. Hands that differ only by a permutation of
+suits have the same equities, so the table holds one Monte Carlo estimate per
+isomorphism class of [kept pair, [discarded card]] and a map from every concrete hand
+to its classes. The
+estimates are generated offline, in parallel, into preflop.tables next to this file, and
+bots memory-map it and look hands up in O(1).
+
+preflop.tables is little-endian:
+    magic b'PREFLOP1\n', uint32 class count, uint32 samples per class,
+    float32 equity of every class,
+    uint16 class of every (hand, discard), at 3 * hand + discard, where hand is the
+    colex index of the 3 sorted card integers and discard the position of the discarded
+    card among them.
+
+Run this file to generate the table: python preflop_table.py [--samples N] [--workers N]
+'''
+import argparse
+from itertools import combinations
+from math import comb
+import mmap
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+import equity
+import hand_eval
+import isomorphism
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preflop.tables')
+TABLE_MAGIC = b'PREFLOP1\n'
+HEADER = struct.Struct('<II')
+NUM_HANDS = comb(52, 3)
+
+
+def hand_index(cards):
+    '''
+    Returns the colex index of 3 distinct card integers and the cards in sorted order.
+    '''
+    first, second, third = sorted(cards)
+    return first + comb(second, 2) + comb(third, 3), (first, second, third)
+
+
+def classes():
+    '''
+    Returns the representative (kept pair, discarded card) of every class and the class
+    of every (hand, discard), in table order.
+    '''
+    representatives = []
+    class_ids = {}
+    class_of = [0] * (3 * NUM_HANDS)
+    for cards in combinations(range(52), 3):
+        index = hand_index(cards)[0]
+        for discard in range(3):
+            key = isomorphism.index([[card for i, card in enumerate(cards) if i != discard], [cards[discard]]])
+            if key not in class_ids:
+                class_ids[key] = len(representatives)
+                representatives.append(isomorphism.unindex(key, 2))
+            class_of[3 * index + discard] = class_ids[key]
+    return representatives, class_of
+
+
+def class_equity(job):
+    '''
+    Estimates the equity of one class from its own random stream.
+    '''
+    class_id, (kept, discard), samples, seed = job
+    rng = numpy.random.default_rng([seed, class_id]) if numpy is not None else None
+    return equity.estimate(kept, discard, samples, rng)[0]
+
+
+def generate(samples=20000, workers=None, seed=0):
+    '''
+    Estimates every class on a pool of worker processes and writes preflop.tables.
+    '''
+    start_time = time.perf_counter()
+    representatives, class_of = classes()
+    jobs = [(class_id, key, samples, seed) for class_id, key in enumerate(representatives)]
+    with multiprocessing.Pool(workers) as pool:
+        equities = pool.map(class_equity, jobs, chunksize=16)
+    # write to a temporary file first so a bot never maps a partial table
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(TABLE_PATH))
+    with os.fdopen(handle, 'wb') as table_file:
+        table_file.write(TABLE_MAGIC)
+        table_file.write(HEADER.pack(len(representatives), samples))
+        table_file.write(struct.pack('<{}f'.format(len(equities)), *equities))
+        table_file.write(struct.pack('<{}H'.format(len(class_of)), *class_of))
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, TABLE_PATH)
+    print('Wrote {} classes x {} samples to {} in {:.1f}s'.format(
+        len(representatives), samples, TABLE_PATH, time.perf_counter() - start_time))
+
+
+def load():
+    '''
+    Memory-maps preflop.tables and returns its equities and class map, or None if it has
+    not been generated.
+    '''
+    if not os.path.exists(TABLE_PATH):
+        return None
+    with open(TABLE_PATH, 'rb') as table_file:
+        mapped = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(TABLE_MAGIC)] != TABLE_MAGIC:
+        raise ValueError(TABLE_PATH + ' is not a preflop table file')
+    num_classes = HEADER.unpack_from(mapped, len(TABLE_MAGIC))[0]
+    start = len(TABLE_MAGIC) + HEADER.size
+    view = memoryview(mapped)
+    equities = view[start:start + 4 * num_classes].cast('f')
+    class_of = view[start + 4 * num_classes:start + 4 * num_classes + 6 * NUM_HANDS].cast('H')
+    return equities, class_of
+
+
+_table = load()
+
+
+def kept_equities(cards):
+    '''
+    Returns the preflop equity of discarding each of 3 cards, in the order given, or None
+    if the table has not been generated.
+    '''
+    if _table is None:
+        return None
+    equities, class_of = _table
+    cards = hand_eval.encode(cards)
+    index, ordered = hand_index(cards)
+    return [equities[class_of[3 * index + ordered.index(card)]] for card in cards]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates the preflop equity table.')
+    parser.add_argument('--samples', type=int, default=20000, help='Monte Carlo runouts per class')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the per-class random streams')
+    args = parser.parse_args()
+    generate(args.samples, args.workers, args.seed)
@@ -1,6 +1,12 @@
+import os
+import sys
 import torch
 
-def encode_state(my_cards, board_cards, my_stack, opp_stack, my_pip, opp_pip, street):
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import hand_eval
+import isomorphism  # suit-isomorphic canonical forms shared with the equity code
+
+def encode_state(my_cards, board_cards, my_stack, opp_stack, my_pip, opp_pip, street, canonical=False):
     """
     Encodes the poker game state into a single tensor for the neural network.
 
@@ -10,10 +16,14 @@ def encode_state(my_cards, board_cards, my_stack, opp_stack, my_pip, opp_pip, st
         my_stack, opp_stack: int (chips remaining)
         my_pip, opp_pip: int (chips in pot this round)
         street: int (0=Preflop, 3=Flop, 4=Turn, 5=River)
+        canonical: relabel suits to the isomorphism class representative first, so
+            suit-isomorphic states encode alike (a model must be trained with the same setting)
 
     Returns:
         torch.Tensor of shape (113,)
     """
+    if canonical:
+        my_cards, board_cards = _canonical_cards(my_cards, board_cards)
 
     # 1. ENCODE CARDS (One-Hot)
     # 52 inputs for my cards, 52 inputs for board
@@ -58,6 +68,11 @@ def encode_state(my_cards, board_cards, my_stack, opp_stack, my_pip, opp_pip, st
 
     return torch.tensor(features, dtype=torch.float32)
 
+def _canonical_cards(my_cards, board_cards):
+    """Helper to relabel the suits of (my cards, board) to their canonical representative."""
+    groups = isomorphism.canonicalize([hand_eval.encode(my_cards), hand_eval.encode(board_cards)])
+    return [[hand_eval.RANK_CHARS[c % 13] + hand_eval.SUIT_CHARS[c // 13] for c in group] for group in groups]
+
 def _cards_to_vec(cards):
     """Helper to convert list of card strings to 52-bit binary vector."""
     vec = [0] * 52
@@ -1,6 +1,14 @@
+import os
 import random
+import sys
 import pkrbot
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import equity  # vectorized Monte Carlo equity shared by the bots
+import preflop_table  # offline preflop equities, see preflop_table.py
+import discard_oracle  # cached discard equities, see discard_oracle.py
+import equity_pool  # optional equity worker processes, see equity_pool.py
+
 FINAL_BOARD_CARDS = 6  # Toss/Hold'em ends with 6 community cards
 
 FINAL_BOARD_CARDS = 6
@@ -53,52 +61,27 @@ def str_to_card(card_input):
     return card_input
 
 def mc_equity(my_hole2, board, iters=500):
-    # 1. Normalize inputs to ensure they are Card objects
-    my_hole2 = str_to_card(my_hole2)
-    board = str_to_card(board)
-
-    # 2. Define the deck (integers 0-51) excluding known cards
-    known_ints = {card_to_int(c) for c in my_hole2 + board}
-    deck_ints = [c for c in range(52) if c not in known_ints]
-
-    # 3. Initialize the win counter
-    wins = 0.0
-
-    # 4. Determine how many cards needed to fill the board to 6
-    need_board = max(0, FINAL_BOARD_CARDS - len(board))
-
-    # randomly sample the remaining cards for the board and the other players two hole cards
-
-    for _ in range(iters):
-        sample_ints = random.sample(deck_ints, need_board + 2)
-        sample_cards = [int_to_card(i) for i in sample_ints]
-        full_board = board + sample_cards[:need_board]
-        opp_hole2 = sample_cards[need_board:]
-
-        my_score = pkrbot.evaluate(my_hole2 + full_board)
-        opp_score = pkrbot.evaluate(opp_hole2 + full_board)
-
-        if my_score > opp_score:
-            wins += 1.0
-        elif my_score == opp_score:
-            wins += 0.5
-
-    return wins / iters
-
-def best_discard_index(my_hole3, board, iters=10000):
-    scores = []
-    for i in range(3):
-        discarded = my_hole3[i]
-        remaining = my_hole3[:i] + my_hole3[i+1:] # The 2 cards you keep
-        new_board = board + [discarded]     # The discard becomes public board
-
-        # We simply maximize equity.
-        # If the discard helps the opponent (random range), equity drops naturally.
-        scores.append(mc_equity(remaining, new_board, iters=iters))
-
-    # print("DEBUG scores:", scores, flush=True)
-    # print("DEBUG card removed:", my_hole3[scores.index(max(scores))], 'with initial hole cards:', my_hole3, 'and board:', board, flush=True)
-    # a higher mc_equity means the remaining cards in my hand are better
+    # Vectorized runouts scored in one batch: a win counts 1, a tie 0.5
+    return equity.mc_equity([card_to_int(c) for c in my_hole2], [card_to_int(c) for c in board], iters)
+
+def start_equity_pool(workers=None):
+    # Fork the equity workers now, before the first round; None means everything runs in
+    # this process (no spare cores, or the platform cannot fork)
+    return equity_pool.start(workers)
+
+def preflop_equities(my_hole3):
+    # Equity of discarding each card, from the offline table (None if it was not generated)
+    return preflop_table.kept_equities([card_to_int(c) for c in my_hole3])
+
+def best_discard_index(my_hole3, board, iters=2000):
+    # Equity of discarding each card (the discard becomes public board), looked up by
+    # canonical hand and board; on a miss, iters Monte Carlo runouts shared by all three
+    # choices, so their differences are not swamped by sampling noise.
+    # If the discard helps the opponent (random range), equity drops naturally.
+    scores = discard_oracle.discard_equities([card_to_int(c) for c in my_hole3],
+                                             [card_to_int(c) for c in board], iters)
+
+    # a higher equity means the remaining cards in my hand are better
     return scores.index(max(scores))
 
 
@@ -1,4 +1,10 @@
 from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction
+from fixed_actions.discard import preflop_equities
+
+# Best kept-pair equity (offline preflop table) needed to raise / to call.
+# About the top 15% and the top 80% of starting hands, like the rank rules below.
+RAISE_EQUITY = 0.62
+CALL_EQUITY = 0.45
 
 def get_preflop_action(round_state, active):
         '''
@@ -6,10 +12,31 @@ def get_preflop_action(round_state, active):
         1. Raise with Pairs (22+) and Double High Cards (AK, QJ).
         2. Call with any Single High Card (A2, K9) or Connectors.
         3. Check/Fold everything else.
+
+        When the offline preflop table has been generated, the equity of the best pair
+        to keep decides instead.
         '''
         legal_actions = round_state.legal_actions()
         my_cards = round_state.hands[active]
 
+        equities = preflop_equities(my_cards)
+        if equities is not None:
+            strength = max(equities)
+            if strength >= RAISE_EQUITY:
+                if RaiseAction in legal_actions:
+                    min_raise, max_raise = round_state.raise_bounds()
+                    return RaiseAction(min_raise)
+                elif CallAction in legal_actions:
+                    return CallAction()
+            if strength >= CALL_EQUITY:
+                if CallAction in legal_actions:
+                    return CallAction()
+                if CheckAction in legal_actions:
+                    return CheckAction()
+            if CheckAction in legal_actions:
+                return CheckAction()
+            return FoldAction()
+
         # --- 1. Card Parsing ---
         # Cards are strings like 'As', 'Td', '2c'.
         # Rank is index 0. Suit is index 1.
@@ -17,7 +17,7 @@ from brain.agent import RLAgent
 from brain.encoder import encode_state
 
 from fixed_actions.preflop import get_preflop_action
-from fixed_actions.discard import best_discard_index
+from fixed_actions.discard import best_discard_index, start_equity_pool
 
 
 import os
@@ -27,6 +27,9 @@ import torch
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from config import PLAYER_1_NAME, PLAYER_2_NAME
 
+# False when the engine hosts the bot in its own process (HEADLESS), which must not be forked
+OWN_PROCESS = __name__ == '__main__'
+
 class Player(Bot):
     '''
     A pokerbot.
@@ -36,12 +39,16 @@ class Player(Bot):
         '''
         Called when a new game starts. Called exactly once.
 
+        Starts the optional equity worker pool for the discard Monte Carlo, unless the bot
+        runs inside the engine process.
+
         Arguments:
         Nothing.
 
         Returns:
         Nothing.
         '''
+        self.equity_pool = start_equity_pool() if OWN_PROCESS else None
         self.brain = RLAgent(training_mode=True)
         self.prev_fc1 = self.brain.policy.fc1.weight.detach().clone()
         self.chip_delta_sum = 0
@@ -49,6 +56,38 @@ class Player(Bot):
 
         self.buffer = []
 
+    def handle_new_match(self):
+        '''
+        Called when the engine reuses this bot for another match.
+
+        The brain keeps what it has learned. Only the per-match logging tallies start over,
+        and the equity worker pool stopped at the end of the last match is restarted.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Nothing.
+        '''
+        self.chip_delta_sum = 0
+        self.rounds_since_log = 0
+        self.buffer = []
+        self.equity_pool = start_equity_pool() if OWN_PROCESS else None
+
+    def handle_match_over(self):
+        '''
+        Called when a match ends. Stops the equity worker pool.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Nothing.
+        '''
+        if self.equity_pool is not None:
+            self.equity_pool.close()
+            self.equity_pool = None
+
     def handle_new_round(self, game_state, round_state, active):
         '''
         Called when a new round starts. Called NUM_ROUNDS times.
@@ -1,29 +1,48 @@
 import random
+import time
 from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction
-from utils import mc_equity
+from utils import anytime_equity, hand_equity, preflop_equities
+
+# Strength cut-offs the betting brain compares against (see _respond_to_bet and _open_betting)
+STRENGTH_TIERS = [0.65, 0.75, 0.90]
+# Longest a single strength estimate may think, in seconds
+THINK_BUDGET = 0.05
 
 # -------------------------------------------------------------------------
 # STRENGTH CALCULATOR
 # -------------------------------------------------------------------------
-def calculate_strength(my_cards, board_cards, time_left):
+def calculate_strength(my_cards, board_cards, time_left, pot_odds=0, opp_range=None, range_key=None):
     """
-    Determines hand strength using Monte Carlo.
+    Determines hand strength using Monte Carlo, or exact enumeration on late streets.
     Handles the special 3-card pre-discard case.
+    Stops sampling once the strength is clearly above or below every cut-off it will be
+    compared with (the strength tiers and pot_odds).
+    With opp_range (narrowed by the opponent's actions, which range_key lists) the
+    strength is the equity against that range rather than a random hand.
     """
     # Case A: Pre-discard (3 cards) - Approximation
     if len(my_cards) == 3:
+        # Preflop: look the best kept pair up in the offline table
+        if not board_cards:
+            equities = preflop_equities(my_cards)
+            if equities is not None:
+                return max(equities)
         possibilities = []
         for i in range(3):
             # Simulate keeping pair (i, j) and discarding k
             kept_cards = my_cards[:i] + my_cards[i+1:]
             # We simulate lightly (50 iters) for speed
-            possibilities.append(mc_equity(kept_cards, board_cards, iters=50))
+            possibilities.append(hand_equity(kept_cards, board_cards, iters=50))
         return max(possibilities)
 
     # Case B: Standard Play (2 cards)
     # Dynamic iterations: Think deeper if we have time
+    # (exact instead once the board is late enough that enumerating is cheaper)
     iters = 500 if time_left > 15 else 100
-    return mc_equity(my_cards, board_cards, iters=iters)
+    thresholds = STRENGTH_TIERS + ([pot_odds] if pot_odds > 0 else [])
+    deadline = time.perf_counter() + min(THINK_BUDGET, time_left / 100)
+    return anytime_equity(my_cards, board_cards, thresholds, deadline, max_iters=iters,
+                          weights=opp_range, opponent=range_key if opp_range is not None else None)
 
 
 # -------------------------------------------------------------------------
@@ -13,9 +13,13 @@ import random
 # from poker.hand import Combo
 import pkrbot
 
-from utils import best_discard_index, mc_equity
+from utils import best_discard_index, equity_cache_report, mc_equity, narrow_range, opponent_range
+from utils import start_equity_pool
 from helpers import calculate_strength, get_betting_action
 
+# False when the engine hosts the bot in its own process (HEADLESS), which must not be forked
+OWN_PROCESS = __name__ == '__main__'
+
 class Player(Bot):
     '''
     A pokerbot.
@@ -25,13 +29,29 @@ class Player(Bot):
         '''
         Called when a new game starts. Called exactly once.
 
+        Starts the optional equity worker pool so large equity and discard queries can
+        be split across spare cores, unless the bot runs inside the engine process.
+
         Arguments:
         Nothing.
 
         Returns:
         Nothing.
         '''
-        pass
+        self.equity_pool = start_equity_pool() if OWN_PROCESS else None
+
+    def handle_new_match(self):
+        '''
+        Called when the engine reuses this bot for another match. Restarts the equity
+        worker pool stopped at the end of the last one.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Nothing.
+        '''
+        self.equity_pool = start_equity_pool() if OWN_PROCESS else None
 
     def handle_new_round(self, game_state, round_state, active):
         '''
@@ -51,7 +71,10 @@ class Player(Bot):
         round_num = game_state.round_num  # the round number from 1 to NUM_ROUNDS
         my_cards = round_state.hands[active]  # your cards
         big_blind = bool(active)  # True if you are the big blind
-        pass
+        self.opp_range = opponent_range()  # weights of the opponent's possible holdings
+        self.range_actions = ()  # sorted (board size, action) of the opponent actions that narrowed it
+        self.last_action = None  # (street, board, action type) of our last postflop action
+        self.raised_later = False  # whether the opponent raised after our first decision on this street
 
     def handle_round_over(self, game_state, terminal_state, active):
         '''
@@ -73,6 +96,22 @@ class Player(Bot):
         opp_cards = previous_state.hands[1-active]
         pass
 
+    def handle_match_over(self):
+        '''
+        Called when a match ends. Reports how the shared equity cache did and stops the
+        equity worker pool.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Nothing.
+        '''
+        print(equity_cache_report())
+        if self.equity_pool is not None:
+            self.equity_pool.close()
+            self.equity_pool = None
+
     def get_action(self, game_state, round_state, active):
         '''
         Where the magic happens - your code should implement this function.
@@ -116,19 +155,65 @@ class Player(Bot):
             best_discard_idx = best_discard_index(my_cards, board_cards)
             return DiscardAction(best_discard_idx)
 
-        # 2. METRICS
-        strength = calculate_strength(my_cards, board_cards, game_state.game_clock)
+        # 2. OPPONENT RANGE
+        # Postflop, player 1 acts first on every street: facing a bet means they bet or
+        # raised, and player 0 facing nothing means they checked. The range is narrowed once
+        # per street, before our first decision on it, so every decision on a street asks the
+        # equity cache about the same range; a later raise narrows it from the next street on
+        if street >= 4:
+            if self.last_action is None or street > self.last_action[0]:
+                if self.last_action is not None:
+                    _, last_board, last_action = self.last_action
+                    if self.raised_later:
+                        self.narrow(last_board, 'raise')
+                    # the street closed after our bet was called, or after player 1's check was checked behind
+                    if last_action is RaiseAction:
+                        self.narrow(last_board, 'call')
+                    elif last_action is CheckAction and active == 1:
+                        self.narrow(last_board, 'check')
+                self.raised_later = False
+                if continue_cost > 0:
+                    self.narrow(board_cards, 'raise')
+                elif active == 0:
+                    self.narrow(board_cards, 'check')
+            elif continue_cost > 0:
+                self.raised_later = True
+
+        # 3. METRICS
         pot_total = (STARTING_STACK - my_stack) + (STARTING_STACK - opp_stack)
 
         if continue_cost > 0:
             pot_odds = continue_cost / (pot_total + continue_cost)
         else:
             pot_odds = 0
+        strength = calculate_strength(my_cards, board_cards, game_state.game_clock, pot_odds,
+                                      self.opp_range if self.range_actions else None, self.range_actions)
 
-        # 3. DECISION (Delegate to helpers.py)
-        return get_betting_action(
+        # 4. DECISION (Delegate to helpers.py)
+        action = get_betting_action(
             strength, pot_odds, pot_total, continue_cost, legal_actions, round_state
         )
+        if street >= 4:
+            self.last_action = (street, board_cards, type(action))
+        return action
+
+    def narrow(self, board_cards, action):
+        '''
+        Narrows the opponent's range by one of their actions on the given board, once per
+        board and action. Narrowing multiplies the weights, so the sorted actions describe the
+        range whatever their order, and key it in the equity cache.
+
+        Arguments:
+        board_cards: the board the opponent acted on.
+        action: 'raise', 'call' or 'check'.
+
+        Returns:
+        Nothing.
+        '''
+        if (len(board_cards), action) in self.range_actions:
+            return
+        self.opp_range = narrow_range(self.opp_range, board_cards, action)
+        self.range_actions = tuple(sorted(self.range_actions + ((len(board_cards), action),)))
 
 if __name__ == '__main__':
     run_bot(Player(), parse_args())
@@ -0,0 +1,8 @@
+'''
+Puts the engine modules and config.py on the import path of the tests.
+'''
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,93 @@
+'''
+Checks the sampled equities against exact enumeration.
+'''
+import pytest
+import equity
+
+numpy = pytest.importorskip('numpy')
+
+Z = 4.  # standard errors a sampled equity may stray from the exact one
+CASES = [
+    ([0, 14], [5, 20, 33, 40]),  # 2c 3d on 7c 9d 9h 3s
+    ([12, 25], [0, 13, 26, 40]),  # Ac Ad on 2c 2d 2h 3s
+    ([51, 50], [47, 46, 9]),  # As Ks on Ts 9s Jc, only checked on the river below
+    ([8, 22], [10, 11, 35, 3, 17]),  # Tc Jd on Qc Kc Jh 5c 6d
+]
+LATE_CASES = [case for case in CASES if len(case[1]) >= 4]
+
+
+def range_weights():
+    return numpy.random.default_rng(1).random(len(equity.PAIRS))
+
+
+@pytest.mark.parametrize('my_cards, board', LATE_CASES)
+def test_estimate_is_near_exact(my_cards, board):
+    expected = equity.exact(my_cards, board)[0]
+    mean, stderr = equity.estimate(my_cards, board, 20000, numpy.random.default_rng(3))
+    assert 0. < stderr < 0.01
+    assert abs(mean - expected) < Z * stderr
+
+
+@pytest.mark.parametrize('my_cards, board', LATE_CASES)
+def test_anytime_reaches_its_target(my_cards, board):
+    expected = equity.exact(my_cards, board)[0]
+    mean, stderr, runouts = equity.anytime(my_cards, board, target_stderr=0.005, max_iters=100000,
+                                           rng=numpy.random.default_rng(4))
+    assert runouts < 100000 and stderr <= 0.005
+    assert abs(mean - expected) < Z * max(stderr, 1e-3)
+
+
+@pytest.mark.parametrize('my_cards, board', LATE_CASES)
+def test_anytime_settles_on_the_right_side(my_cards, board):
+    expected = equity.exact(my_cards, board)[0]
+    thresholds = [threshold for threshold in (0.2, 0.5, 0.8) if abs(threshold - expected) > 0.05]
+    mean, stderr, runouts = equity.anytime(my_cards, board, thresholds=thresholds, max_iters=100000,
+                                           rng=numpy.random.default_rng(5))
+    assert runouts < 100000
+    for threshold in thresholds:
+        assert (mean > threshold) == (expected > threshold)
+
+
+def test_river_exact_matches_a_full_count():
+    my_cards, board = CASES[2][0], CASES[2][1] + [1, 30, 44]
+    seen = set(my_cards + board)
+    my_value = equity.hand_eval.evaluate(my_cards + board)
+    wins = total = 0.
+    for first, second in equity.PAIRS:
+        if first in seen or second in seen:
+            continue
+        opp_value = equity.hand_eval.evaluate([first, second] + board)
+        wins += 1. if my_value > opp_value else (0.5 if my_value == opp_value else 0.)
+        total += 1
+    assert equity.exact(my_cards, board)[0] == pytest.approx(wins / total)
+
+
+@pytest.mark.parametrize('my_cards, board', LATE_CASES)
+def test_range_sampling_is_near_exact(my_cards, board):
+    weights = range_weights()
+    expected = equity.range_equity(my_cards, board, weights, iters=10 ** 9)[0]
+    # range_outcomes directly: range_equity enumerates once the board tables are cached
+    totals = equity.cumulative(equity.live_range(my_cards, board, weights))
+    mean, stderr = equity.summarize(equity.range_outcomes(my_cards, board, totals, 20000, numpy.random.default_rng(6)))
+    assert 0. < stderr < 0.01
+    assert abs(mean - expected) < Z * stderr
+    mean, stderr, _ = equity.anytime(my_cards, board, target_stderr=0.005, max_iters=100000,
+                                     rng=numpy.random.default_rng(7), weights=weights)
+    assert abs(mean - expected) < Z * max(stderr, 1e-3)
+
+
+def test_uniform_range_is_a_random_hand():
+    my_cards, board = CASES[0]
+    assert equity.range_equity(my_cards, board, equity.uniform_range(), iters=10 ** 9)[0] == \
+        pytest.approx(equity.exact(my_cards, board)[0])
+
+
+def test_cache_tops_up_instead_of_resampling():
+    cache = equity.EquityCache()
+    my_cards, board = [0, 14], [5, 20, 33]
+    cache.estimate(my_cards, board, 1000)
+    cache.estimate(my_cards, board, 3000)
+    cache.estimate(my_cards, board, 2000)
+    entry = next(iter(cache.entries.values()))
+    assert entry[0] == 3000
+    assert (cache.misses, cache.top_ups, cache.hits) == (1, 1, 1)
@@ -0,0 +1,33 @@
+'''
+Checks the table-driven evaluator against pkrbot.evaluate.
+'''
+from itertools import combinations
+import random
+import pytest
+import pkrbot
+import hand_eval
+
+CARDS = [hand_eval.to_card(card) for card in range(52)]
+
+
+def expected_values(hands):
+    evaluate = pkrbot.evaluate
+    return [evaluate([CARDS[card] for card in hand]) for hand in hands]
+
+
+def test_every_five_card_hand():
+    hands = list(combinations(range(52), 5))
+    assert list(hand_eval.evaluate_many(hands)) == expected_values(hands)
+
+
+@pytest.mark.parametrize('num_cards', [6, 7, 8])
+def test_sampled_hands(num_cards):
+    rng = random.Random(num_cards)
+    hands = [rng.sample(range(52), num_cards) for _ in range(100000)]
+    expected = expected_values(hands)
+    assert list(hand_eval.evaluate_many(hands)) == expected
+    assert [hand_eval.evaluate(hand) for hand in hands[:5000]] == expected[:5000]
+
+
+def test_encode_accepts_every_card_format():
+    assert hand_eval.encode(['2c', 'Ah', CARDS[51], 13]) == [0, 2 * 13 + 12, 51, 13]
@@ -0,0 +1,69 @@
+'''
+Checks that canonical forms and class indices round-trip and respect suit relabeling.
+'''
+from itertools import permutations
+import random
+import pytest
+import isomorphism
+
+
+def random_state(rng, sizes):
+    cards = rng.sample(range(52), sum(sizes))
+    groups = []
+    for size in sizes:
+        groups.append(cards[:size])
+        cards = cards[size:]
+    return groups
+
+
+def relabel(groups, suits):
+    return [[suits[card // 13] * 13 + card % 13 for card in group] for group in groups]
+
+
+SHAPES = [(2, 3), (3, 2), (3, 2, 1), (2, 4), (2, 5, 1)]
+
+
+@pytest.mark.parametrize('sizes', SHAPES)
+def test_canonical_round_trips(sizes):
+    rng = random.Random(len(sizes) * 10 + sum(sizes))
+    for _ in range(2000):
+        groups = random_state(rng, sizes)
+        canonical = isomorphism.canonicalize(groups)
+        class_index = isomorphism.index(groups)
+        assert isomorphism.canonicalize(canonical) == canonical
+        assert isomorphism.index(canonical) == class_index
+        assert isomorphism.unindex(class_index, len(groups)) == canonical
+        # undoing the canonical relabeling gives the state back
+        suits = isomorphism.suit_map(groups)
+        inverse = [suits.index(suit) for suit in range(4)]
+        assert [sorted(group) for group in relabel(canonical, inverse)] == [sorted(group) for group in groups]
+
+
+@pytest.mark.parametrize('sizes', SHAPES)
+def test_relabeled_suits_share_a_class(sizes):
+    rng = random.Random(sum(sizes))
+    for _ in range(200):
+        groups = random_state(rng, sizes)
+        for suits in permutations(range(4)):
+            relabeled = relabel(groups, suits)
+            assert isomorphism.index(relabeled) == isomorphism.index(groups)
+            assert isomorphism.canonicalize(relabeled) == isomorphism.canonicalize(groups)
+
+
+def test_different_classes_differ():
+    # the same cards split differently between the groups are different states
+    assert isomorphism.index([[0, 1], [2, 3, 4]]) != isomorphism.index([[0, 2], [1, 3, 4]])
+    # a flush draw is not the same as an off-suit board
+    assert isomorphism.index([[12, 11], [10, 9, 30]]) != isomorphism.index([[12, 11], [10, 22, 30]])
+
+
+@pytest.mark.parametrize('sizes', SHAPES)
+def test_batches_match_single_states(sizes):
+    pytest.importorskip('numpy')
+    rng = random.Random(100 + sum(sizes))
+    states = [random_state(rng, sizes) for _ in range(500)]
+    batch = [[state[i] for state in states] for i in range(len(sizes))]
+    assert isomorphism.index_many(batch) == [isomorphism.index(state) for state in states]
+    canonical = isomorphism.canonicalize_many(batch)
+    for row, state in enumerate(states):
+        assert [list(group[row]) for group in canonical] == isomorphism.canonicalize(state)
@@ -0,0 +1,137 @@
+'''
+Checks that resuming a checkpointed match and merging shards give the bankrolls of one
+uninterrupted serial match with the same seed.
+'''
+import random
+import pytest
+import engine
+import hand_history
+
+SEED = 2026
+NUM_ROUNDS = 60
+final_bankrolls = {}
+
+
+class ScriptedPlayer(engine.Player):
+    '''
+    Stands in for a pokerbot without a process: each action is a function of the state
+    alone, so a player restarted from a checkpoint plays on exactly as before.
+    '''
+
+    def build(self):
+        self.load_commands()
+
+    def load_commands(self):
+        pass
+
+    def run(self):
+        pass
+
+    def stop(self):
+        final_bankrolls[self.name] = self.bankroll
+        self.output.close()
+
+    def query(self, round_state, player_message, game_log):
+        del player_message[1:]
+        if isinstance(round_state, engine.TerminalState):
+            return engine.CheckAction()
+        rng = random.Random('{} {} {} {} {} {}'.format(self.name, round_state.street, round_state.button,
+                                                       round_state.pips, round_state.hands, round_state.board))
+        legal_actions = round_state.legal_actions()
+        if engine.DiscardAction in legal_actions:
+            return engine.DiscardAction(rng.randrange(3))
+        if engine.RaiseAction in legal_actions and rng.random() < 0.3:
+            return engine.RaiseAction(rng.randint(*round_state.raise_bounds()))
+        if engine.FoldAction in legal_actions and rng.random() < 0.1:
+            return engine.FoldAction()
+        return engine.CheckAction() if engine.CheckAction in legal_actions else engine.CallAction()
+
+
+@pytest.fixture
+def match(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(engine, 'Player', ScriptedPlayer)
+    monkeypatch.setattr(engine, 'HEADLESS', False)
+    monkeypatch.setattr(engine, 'NUM_ROUNDS', NUM_ROUNDS)
+    monkeypatch.setattr(engine, 'CHECKPOINT_INTERVAL', 10)
+    monkeypatch.setattr(engine, 'CHECKPOINT_NAME', 'gamelog.checkpoint.json')
+    final_bankrolls.clear()
+    return tmp_path
+
+
+def run_match(log_name, checkpoint=None):
+    seed = checkpoint['seed'] if checkpoint is not None else SEED
+    engine.Game(seed, log_name, checkpoint=checkpoint).run()
+    return dict(final_bankrolls)
+
+
+def latency_counts(log):
+    return [line.split(':')[1].split(',')[0] for line in log.splitlines() if ' latency: ' in line]
+
+
+@pytest.mark.parametrize('crash_save', [1, 2])
+def test_resume_matches_an_uninterrupted_run(match, monkeypatch, crash_save):
+    # checkpoints after rounds 15, 30 and 45: the resumed match starts in either seating
+    monkeypatch.setattr(engine, 'CHECKPOINT_INTERVAL', 15)
+    expected = run_match('straight')
+    assert not (match / 'gamelog.checkpoint.json').exists()
+    assert sum(expected.values()) == 0 and any(expected.values())
+
+    saves = []
+    save_checkpoint = engine.Game.save_checkpoint
+
+    def crash(game, players, round_num):
+        save_checkpoint(game, players, round_num)
+        saves.append(round_num)
+        if len(saves) == crash_save:
+            raise KeyboardInterrupt
+    monkeypatch.setattr(engine.Game, 'save_checkpoint', crash)
+    with pytest.raises(KeyboardInterrupt):
+        run_match('crashed')
+    monkeypatch.setattr(engine.Game, 'save_checkpoint', save_checkpoint)
+
+    checkpoint = engine.load_checkpoint('gamelog.checkpoint.json')
+    round_num = 15 * crash_save
+    assert checkpoint['round_num'] == round_num
+    final_bankrolls.clear()
+    assert run_match('crashed', checkpoint) == expected
+    assert not (match / 'gamelog.checkpoint.json').exists()
+    log = (match / 'crashed.txt').read_text()
+    assert 'Resumed after round {}'.format(round_num) in log
+    for resumed_round in (round_num, round_num + 1):
+        assert log.count('Round #{},'.format(resumed_round)) == 1
+    assert latency_counts(log) == latency_counts((match / 'straight.txt').read_text())
+
+
+def test_resume_refuses_a_different_match(match, monkeypatch):
+    monkeypatch.setattr(engine, 'CHECKPOINT_INTERVAL', 20)
+    game = engine.Game(SEED, 'gamelog')
+    game.checkpoint_name = 'gamelog.checkpoint.json'
+    game.play([ScriptedPlayer(engine.PLAYER_1_NAME, '.'), ScriptedPlayer(engine.PLAYER_2_NAME, '.')], 1, 30)
+    game.log.close()
+    assert engine.load_checkpoint('gamelog.checkpoint.json')['round_num'] == 20
+    monkeypatch.setattr(engine, 'NUM_ROUNDS', NUM_ROUNDS + 1)
+    assert engine.load_checkpoint('gamelog.checkpoint.json') is None
+
+
+def final_line(log):
+    return [line for line in log.splitlines() if line.startswith('Final')][-1]
+
+
+def test_shards_merge_into_the_serial_match(match, monkeypatch):
+    serial = run_match('serial')
+    monkeypatch.setattr(engine, 'MATCH_SHARDS', 3)
+    monkeypatch.setattr(engine, 'MATCH_SEED', SEED)
+    monkeypatch.setattr(engine, 'GAME_LOG_FILENAME', 'gamelog')
+    engine.run_parallel()  # the shard processes fork with the scripted players in place
+    assert final_line((match / 'gamelog.txt').read_text()) == final_line((match / 'serial.txt').read_text())
+    assert sum(serial.values()) == 0
+    serial_history = hand_history.HandHistory('serial')
+    merged_history = hand_history.HandHistory('gamelog')
+    assert len(merged_history) == len(serial_history) == NUM_ROUNDS
+    assert merged_history.deltas() == serial_history.deltas()
+    for round_num in range(1, NUM_ROUNDS + 1):
+        merged = merged_history.read(round_num)
+        serial_round = serial_history.read(round_num)
+        assert merged['round'] == round_num
+        assert [action[:2] for action in merged['actions']] == [action[:2] for action in serial_round['actions']]
@@ -0,0 +1,121 @@
+'''
+Checks the __slots__ RoundState against the namedtuple one it replaced, state by state.
+'''
+import random
+import pytest
+import engine
+from engine import CallAction, CheckAction, DiscardAction, FoldAction, RaiseAction, TerminalState
+import reference_states
+
+
+def new_deck(seed):
+    deck = engine.pkrbot.Deck()
+    deck.rng.seed(seed)
+    deck.shuffle()
+    return deck
+
+
+def start(state_class, seed, *chain):
+    '''
+    Deals the round of a seed and returns its first state; each implementation gets its own
+    deck, hands and board since discards mutate them.
+    '''
+    deck = new_deck(seed)
+    hands = [deck.deal(3), deck.deal(3)]
+    return state_class(0, 0, [engine.SMALL_BLIND, engine.BIG_BLIND],
+                       [engine.STARTING_STACK - engine.SMALL_BLIND, engine.STARTING_STACK - engine.BIG_BLIND],
+                       hands, deck, [], *chain)
+
+
+def assert_same(state, reference):
+    assert state.button == reference.button
+    assert state.street == reference.street
+    assert list(state.pips) == list(reference.pips)
+    assert list(state.stacks) == list(reference.stacks)
+    assert state.hands == reference.hands
+    assert state.board == reference.board
+    assert set(state.legal_actions()) == reference.legal_actions()
+    if RaiseAction in reference.legal_actions():
+        assert state.raise_bounds() == reference.raise_bounds()
+
+
+def play(seed, choose):
+    '''
+    Plays one round through both implementations, taking each action choose picks from the
+    reference state, and returns both terminal states.
+    '''
+    state = start(engine.RoundState, seed)
+    reference = start(reference_states.RoundState, seed, None)
+    while not isinstance(reference, TerminalState):
+        assert not isinstance(state, TerminalState)
+        assert_same(state, reference)
+        action = choose(reference)
+        state = state.proceed(action)
+        reference = reference.proceed(action)
+    assert isinstance(state, TerminalState)
+    assert state.deltas == reference.deltas
+    assert_same(state.previous_state, reference.previous_state)
+    return state, reference
+
+
+def scripted(actions):
+    actions = iter(actions)
+    return lambda reference: next(actions)
+
+
+def random_action(rng):
+    def choose(reference):
+        legal_actions = reference.legal_actions()
+        if DiscardAction in legal_actions:
+            return DiscardAction(rng.randrange(3))
+        action = rng.choice(sorted(legal_actions, key=lambda action: action.__name__))
+        if action is RaiseAction:
+            return RaiseAction(rng.randint(*reference.raise_bounds()))
+        if action is FoldAction and rng.random() < 0.8:
+            return CheckAction() if CheckAction in legal_actions else CallAction()
+        return action()
+    return choose
+
+
+def test_small_blind_folds():
+    state, _ = play(1, scripted([FoldAction()]))
+    assert state.deltas == [-engine.SMALL_BLIND, engine.SMALL_BLIND]
+
+
+def test_opening_raise_bounds():
+    state = start(engine.RoundState, 1)
+    assert state.legal_actions() == {FoldAction, CallAction, RaiseAction}
+    assert state.raise_bounds() == (2 * engine.BIG_BLIND, engine.STARTING_STACK)
+
+
+def test_limp_reaches_the_discards():
+    state = start(engine.RoundState, 2).proceed(CallAction()).proceed(CheckAction())
+    assert (state.street, state.button, state.pips) == (2, 1, (0, 0))
+    assert len(state.board) == 2
+    assert state.legal_actions() == {DiscardAction}
+    state = state.proceed(DiscardAction(0))
+    assert state.legal_actions() == {CheckAction}
+    assert len(state.board) == 3 and len(state.hands[1]) == 2
+
+
+def test_all_in_checks_down_to_showdown():
+    actions = [RaiseAction(engine.STARTING_STACK), CallAction(), DiscardAction(2), CheckAction(), DiscardAction(1),
+               CheckAction()] + [CheckAction()] * 6
+    state, reference = play(3, scripted(actions))
+    assert abs(state.deltas[0]) in (0, engine.STARTING_STACK)
+    assert state.previous_state.stacks == (0, 0)
+    assert state.previous_state.legal_actions() == {CheckAction, FoldAction}
+
+
+def test_states_keep_no_chain():
+    state = start(engine.RoundState, 4).proceed(RaiseAction(6)).proceed(CallAction())
+    assert not hasattr(state, 'previous_state')
+    with pytest.raises(AttributeError):
+        state.extra = 1
+
+
+@pytest.mark.parametrize('block', range(4))
+def test_random_rounds_match_the_reference(block):
+    rng = random.Random(block)
+    for round_num in range(500):
+        play(engine.deal_seed(2026, block * 500 + round_num), random_action(rng))